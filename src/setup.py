@@ -28,6 +28,7 @@ setup(
     entry_points={
         'console_scripts': [
             'restapi = yarf.app:main',
+            'restapi-gevent = yarf.geventapp:main',
         ],
     },
     zip_safe=False,
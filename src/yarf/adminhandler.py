@@ -0,0 +1,86 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import signal
+
+from yarf.exceptions import ConfigError
+from yarf.restresource import RestResource
+
+
+class ConfigReloadHandler(RestResource):
+    """ Reloads the configuration of the server
+        The function doing the reload is set by the framework. With
+        pre-forked workers only the worker serving the request would change,
+        so the master is sent SIGHUP and it replaces all the workers.
+    """
+    reload_callback = None
+    per_process = False
+
+    def post(self):
+        if self.per_process:
+            master = os.getppid()
+            os.kill(master, signal.SIGHUP)
+            return {"code": 0, "description": "Reload signalled to the master process",
+                    "data": {"master": master}}, 202
+        try:
+            changes, restart_required = self.reload_callback()
+        except ConfigError as error:
+            return {"code": 1, "description": str(error), "data": {}}, 400
+        return {"code": 0, "description": "", "data": {"changed": changes, "restart_required": restart_required}}
+
+
+class PluginAdminHandler(RestResource):
+    """ Lists, loads, reloads and unloads the plugins
+        PUT loads a new plugin or reloads a loaded one, DELETE unloads it.
+        With pre-forked workers only the worker serving the request would
+        change, so the plugins are reloaded with SIGHUP instead.
+    """
+    registry = None
+    per_process = False
+
+    def get(self, name=None):
+        plugins = self.registry.get_plugins()
+        if name is None:
+            return {"code": 0, "description": "", "data": plugins}
+        if name not in plugins:
+            return {"code": 1, "description": "Plugin %s is not loaded" % name, "data": {}}, 404
+        return {"code": 0, "description": "", "data": {name: plugins[name]}}
+
+    def put(self, name):
+        return self.change(self.registry.load, name)
+
+    def delete(self, name):
+        return self.change(self.registry.unload, name)
+
+    def change(self, func, name):
+        if self.per_process:
+            return {"code": 1, "description": "Send SIGHUP to reload the plugins of all the workers",
+                    "data": {}}, 409
+        try:
+            drained = func(name)
+        except ConfigError as error:
+            return {"code": 1, "description": str(error), "data": {}}, 400
+        return {"code": 0, "description": "", "data": {"plugins": self.registry.get_plugins(), "drained": drained}}
+
+
+class StartupReportHandler(RestResource):
+    """ Reports how long the plugins took to import and initialize
+        and which subareas are still warming up
+    """
+    registry = None
+
+    def get(self):
+        return {"code": 0, "description": "", "data": self.registry.get_report()}
@@ -0,0 +1,127 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import threading
+import time
+
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import ClosingIterator
+
+
+class ConcurrencyLimiter(object):
+    """ Limits the amount of concurrently executed requests
+        Parameters:
+            max_concurrency: Maximum amount of requests executed at once
+            queue_size: Maximum amount of requests waiting for a free slot
+            queue_timeout: Maximum time in seconds a request waits in queue
+    """
+    def __init__(self, max_concurrency, queue_size, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            if self.active < self.max_concurrency:
+                self.active += 1
+                return True
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            deadline = time.time() + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrency:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self.condition.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+
+class AdmissionControl(object):
+    """ WSGI middleware limiting the amount of requests in execution
+        The requests over the limits wait in a bounded queue and get 503 with
+        Retry-After when the queue is full or their wait time is up. The
+        subarea limits are applied before the global one so that requests
+        waiting for a busy subarea do not hold the global slots.
+    """
+    def __init__(self, application, limiter=None, subarea_limiters=None, retry_after=1):
+        self.application = application
+        self.limiter = limiter
+        self.subarea_limiters = subarea_limiters or {}
+        self.retry_after = retry_after
+
+    def get_limiters(self, environ):
+        limiters = []
+        subarea = environ.get("PATH_INFO", "").split("/")[1:2]
+        if subarea and subarea[0] in self.subarea_limiters:
+            limiters.append(self.subarea_limiters[subarea[0]])
+        if self.limiter is not None:
+            limiters.append(self.limiter)
+        return limiters
+
+    def __call__(self, environ, start_response):
+        acquired = []
+
+        def release():
+            for limiter in acquired:
+                limiter.release()
+
+        for limiter in self.get_limiters(environ):
+            if not limiter.acquire():
+                release()
+                return self.reject(environ, start_response)
+            acquired.append(limiter)
+
+        try:
+            app_iter = self.application(environ, start_response)
+        except Exception:
+            release()
+            raise
+        return ClosingIterator(app_iter, [release])
+
+    def reject(self, environ, start_response):
+        response = Response(json.dumps({"message": "Server is busy, try again later"}),
+                            status=503, mimetype="application/json",
+                            headers=[("Retry-After", str(self.retry_after))])
+        return response(environ, start_response)
+
+
+def parse_subarea_limits(value):
+    """ Parses limits given in format subarea:limit,subarea:limit
+    """
+    limits = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        subarea, limit = item.split(":", 1)
+        limits[subarea.strip()] = int(limit)
+    return limits
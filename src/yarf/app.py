@@ -14,23 +14,44 @@
 #
 
 import sys
+import json
 import logging
+import random
+import signal
 import socket
+import threading
+import time
 from OpenSSL import SSL
-from flask import Flask, request
+from flask import Flask, Response, request, g, _request_ctx_stack
 from flask_restful import Api
 from werkzeug.exceptions import InternalServerError
+from yarf.adminhandler import ConfigReloadHandler, PluginAdminHandler, StartupReportHandler
+from yarf.admission import AdmissionControl, ConcurrencyLimiter
+from yarf.authentication.base_auth import BaseAuthMethod
 from yarf.handlers.pluginhandler import PluginLoader
+from yarf.handlers.pluginregistry import PluginRegistry
 from yarf.iniloader import ConfigError
+from yarf.metricshandler import MetricsHandler
+import yarf.metrics as metrics
 import yarf.restfulargs as restfulconfig
 import yarf.restfullogger as restlog
-from yarf.helpers import remove_secrets
+import yarf.serializers as serializers
+import yarf.compression as compression
+import yarf.responsecache as responsecache
+import yarf.pagination as pagination
+import yarf.wsgiserver as wsgiserver
+from yarf.helpers import remove_secrets, scrubber, ResponseTee
 
 CRIT_RESP_LEN = 150000
 
 app = Flask(__name__)
 api = Api(app)
 auth_method = None
+plugin_loader = None
+plugin_registry = None
+reload_lock = threading.Lock()
+body_logging = {"enabled": False, "sample_rate": 1.0, "max_bytes": CRIT_RESP_LEN}
+warming_retry_after = {"seconds": 1}
 
 def handle_excp(failure):
     if isinstance(failure, socket.error):
@@ -55,50 +76,350 @@ def get_config(args, logger):
         return None
     return config
 
+def get_logged_path():
+    path = getattr(g, "yarf_logged_path", None)
+    if path is None:
+        path = g.yarf_logged_path = remove_secrets(request.full_path)
+    return path
+
 def request_logger():
     app.logger.info('Request: remote_addr: %s method: %s endpoint: %s, user: %s', request.remote_addr,
-                    request.method, remove_secrets(request.full_path), get_username())
+                    request.method, get_logged_path(), get_username())
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug('Request\'s headers: %s', scrubber.scrub_headers(request.headers.items()))
+        data = request.get_json(silent=True)
+        if data is not None:
+            app.logger.debug('Request\'s data: %s', scrubber.scrub_data(data))
+
+def route_plugin_request():
+    # Only the requests without a route can be for a plugin not loaded yet
+    if request.url_rule is not None:
+        return None
+    subarea = request.path.split("/")[1]
+    if plugin_registry.load_on_demand(subarea):
+        request.routing_exception = None
+        ctx = _request_ctx_stack.top
+        ctx.url_adapter = app.create_url_adapter(request)
+        ctx.match_request()
+        return None
+    if not plugin_registry.is_warming(subarea):
+        return None
+    return Response(json.dumps({"message": "%s is starting, try again later" % subarea}),
+                    status=503, mimetype="application/json",
+                    headers=[("Retry-After", str(warming_retry_after["seconds"]))])
 
 def response_logger(response):
     app.logger.info('Response: status: %s (Associated Request: remote_addr: %s, method: %s, endpoint: %s, user: %s)',
                     response.status, request.remote_addr, request.method,
-                    remove_secrets(request.full_path), get_username())
+                    get_logged_path(), get_username())
+
+    if app.logger.isEnabledFor(logging.DEBUG) and is_body_logged():
+        log_response_body(response)
+
+    response.headers["Server"] = "Restapi"
+
+    return response
+
+def compress_response(response):
+    enabled = getattr(get_resource_class(), "compress", True)
+    return compression.compress_response(response, enabled)
+
+def serve_cached_response():
+    """ Answers the GET requests from the response cache without calling
+        the resource, the authentication is checked first as login_required
+        does. The requests that fail the authentication get to the resource
+        which rejects them.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    resource = get_resource_class()
+    if not getattr(resource, "cache_ttl", 0):
+        return None
+    user = None
+    auth = getattr(resource, "authentication_method", None)
+    if isinstance(auth, BaseAuthMethod):
+        authenticated, user = auth.authenticate(request)
+        if not authenticated:
+            return None
+    key = responsecache.response_cache.get_key(resource, request, user)
+    entry = responsecache.response_cache.get(key)
+    if entry is None:
+        g.yarf_cache_key = key
+        return None
+    response = entry.make_response().make_conditional(request)
+    if response.status_code == 304:
+        responsecache.response_cache.count_not_modified(resource)
+    return response
+
+def store_cached_response(response):
+    key = getattr(g, "yarf_cache_key", None)
+    if key is None or response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+        return response
+    if "Set-Cookie" in response.headers:
+        return response
+    etag = responsecache.response_cache.set(key, key[0].cache_ttl, response)
+    response.set_etag(etag)
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        responsecache.response_cache.count_not_modified(key[0])
+    return response
+
+def add_response_cache():
+    # Registered after the logging and the metrics so that the cache hits
+    # are logged and counted, the responses are stored before the
+    # compression
+    app.before_request(serve_cached_response)
+    app.after_request(store_cached_response)
+
+def get_resource_class():
+    view = app.view_functions.get(request.endpoint)
+    return getattr(view, "view_class", None)
 
-    if len(response.data) > CRIT_RESP_LEN:
+def is_body_logged():
+    enabled = getattr(get_resource_class(), "log_response_body", None)
+    if enabled is None:
+        enabled = body_logging["enabled"]
+    if not enabled:
+        return False
+    return body_logging["sample_rate"] >= 1.0 or random.random() < body_logging["sample_rate"]
+
+def log_body(data, truncated):
+    if truncated:
         app.logger.debug('Response\'s data is too big, truncating!')
-        app.logger.debug('Response\'s truncated data: %s', response.data[:CRIT_RESP_LEN])
+        app.logger.debug('Response\'s truncated data: %s', data)
     else:
-        app.logger.debug('Response\'s data: %s', response.data)
+        app.logger.debug('Response\'s data: %s', data)
 
-    response.headers["Server"] = "Restapi"
+def log_response_body(response):
+    max_bytes = body_logging["max_bytes"]
+    if response.is_streamed:
+        response.response = ResponseTee(response.response, max_bytes, log_body)
+        return
+    data = response.get_data()
+    log_body(data[:max_bytes], len(data) > max_bytes)
 
+def get_endpoint_labels():
+    rule = request.url_rule
+    if rule is None:
+        return ("", "", "unmatched")
+    parts = rule.rule.split("/")
+    subarea = parts[1] if len(parts) > 1 else ""
+    version = parts[2] if len(parts) > 3 else ""
+    return (subarea, version, rule.rule)
+
+def metrics_start():
+    labels = get_endpoint_labels()
+    g.yarf_metrics = (time.time(), labels)
+    metrics.IN_FLIGHT.inc(labels[:1])
+
+def metrics_response(response):
+    state = getattr(g, "yarf_metrics", None)
+    if state is not None:
+        start, labels = state
+        metrics.REQUESTS.inc(labels + (request.method, str(response.status_code)))
+        metrics.LATENCY.observe(labels, time.time() - start)
     return response
 
+def metrics_teardown(_):
+    state = getattr(g, "yarf_metrics", None)
+    if state is not None:
+        metrics.IN_FLIGHT.dec(state[1][:1])
+
+def add_metrics(config, logger):
+    if not config.get_enable_metrics():
+        return
+    app.before_request(metrics_start)
+    app.after_request(metrics_response)
+    app.teardown_request(metrics_teardown)
+    if config.get_server() == "prefork":
+        metrics.registry.add_worker_label()
+    metrics.registry.add_collector(metrics.simple_collector(
+        "yarf_log_records_dropped_total", "counter", "Log records dropped because the log queue was full",
+        lambda: {(): restlog.get_dropped_records()}))
+    for stat in ("hits", "misses", "not_modified"):
+        metrics.registry.add_collector(metrics.simple_collector(
+            "yarf_response_cache_%s_total" % stat, "counter", "Response cache %s" % stat.replace("_", " "),
+            lambda stat=stat: responsecache.response_cache.get_stats(stat), ("subarea",)))
+    for stat in ("entries", "bytes"):
+        metrics.registry.add_collector(metrics.simple_collector(
+            "yarf_response_cache_%s" % stat, "gauge", "Response cache %s" % stat,
+            lambda stat=stat: responsecache.response_cache.get_stats(stat), ("subarea",)))
+    logger.debug("Registering /metrics")
+    api.add_resource(MetricsHandler, "/metrics")
+
+def get_token_cache_stat(stat):
+    # The authentication object can be replaced by a configuration reload
+    token_cache = getattr(auth_method, "token_cache", None)
+    if token_cache is None:
+        return {}
+    return {(): token_cache.get_stats()[stat]}
+
+def add_auth_metrics():
+    if getattr(auth_method, "token_cache", None) is None:
+        return
+    for stat in ("hits", "misses", "evictions", "expirations"):
+        metrics.registry.add_collector(metrics.simple_collector(
+            "yarf_token_cache_%s_total" % stat, "counter", "Token cache %s" % stat,
+            lambda stat=stat: get_token_cache_stat(stat)))
+    metrics.registry.add_collector(metrics.simple_collector(
+        "yarf_token_cache_entries", "gauge", "Tokens in the token cache",
+        lambda: get_token_cache_stat("entries")))
+
 def get_username():
     try:
-        return auth_method.get_authentication(request)[1]
+        return auth_method.authenticate(request)[1]
     except Exception as err: # pylint: disable=broad-except
-        app.logger.warn("Failed to get username from request returning empty. Err: %s", str(err))
+        # The failure is kept for the request, the request and the response
+        # logging would report it twice
+        if not getattr(g, "yarf_username_failed", False):
+            g.yarf_username_failed = True
+            app.logger.warn("Failed to get username from request returning empty. Err: %s", str(err))
     return ''
 
 
-def initialize(config, logger):
-    logger.info("Initializing...")
+def add_admission_control(config, logger):
+    limiter = None
+    if config.get_max_concurrency():
+        limiter = ConcurrencyLimiter(config.get_max_concurrency(), config.get_queue_size(),
+                                     config.get_queue_timeout())
+    subarea_limiters = {}
+    for subarea, limit in config.get_subarea_concurrency().items():
+        subarea_limiters[subarea] = ConcurrencyLimiter(limit, config.get_queue_size(), config.get_queue_timeout())
+    if limiter is None and not subarea_limiters:
+        return
+    logger.info("Limiting concurrent requests to %s (subareas: %s)", config.get_max_concurrency(),
+                config.get_subarea_concurrency())
+    app.wsgi_app = AdmissionControl(app.wsgi_app, limiter, subarea_limiters, config.get_retry_after())
+
+    limiters = dict(subarea_limiters)
+    if limiter is not None:
+        limiters[""] = limiter
+    for stat in ("active", "waiting", "rejected"):
+        kind = "counter" if stat == "rejected" else "gauge"
+        name = "yarf_admission_rejected_total" if stat == "rejected" else "yarf_admission_%s" % stat
+        metrics.registry.add_collector(metrics.simple_collector(
+            name, kind, "Admission control %s requests" % stat,
+            lambda stat=stat: dict(((subarea,), getattr(lim, stat)) for subarea, lim in limiters.items()),
+            ("subarea",)))
+
+
+def apply_live_config(config):
+    """ Applies the options that can be changed without a restart """
+    body_logging["enabled"] = config.get_log_response_body()
+    body_logging["sample_rate"] = config.get_log_response_body_sample_rate()
+    body_logging["max_bytes"] = config.get_log_response_body_max_bytes()
+    scrubber.configure(config.get_secrets())
+    serializers.configure(config)
+    compression.configure(config)
+    responsecache.configure(config)
+    pagination.configure(config)
     loglevel = logging.INFO if not config.get_debug() else logging.DEBUG
     app.logger.setLevel(loglevel)
+
+def reload_config():
+    """ Reads the configuration file again and applies the changed options
+        A new authentication object is created when the authentication
+        options changed, the requests in progress finish with the old one.
+        Returns: tuple of the changed options and of the changed options
+                 that need a restart
+    """
+    global auth_method
+    logger = restlog.get_logger()
+    config = restfulconfig.RestConfig()
+    with reload_lock:
+        previous = config.get_state()
+        try:
+            changes, restart_required = config.reload()
+        except ConfigError as error:
+            logger.error("Failed to reload the configuration, keeping the old one: %s", error)
+            raise
+        auth_changed = "auth_method" in changes or [name for name in changes if name.startswith("keystone.")]
+        try:
+            apply_live_config(config)
+            if auth_changed:
+                auth_method = plugin_loader.replace_auth_method(
+                    config.get_auth_method(),
+                    plugin_registry.get_handlers() + [ConfigReloadHandler, PluginAdminHandler, StartupReportHandler])
+        except Exception as error:
+            # The next reload compares against the old configuration, so
+            # it applies all the changes again
+            logger.error("Failed to apply the configuration, keeping the old one: %s", error)
+            config.restore(previous)
+            apply_live_config(config)
+            raise ConfigError(str(error))
+    logger.info("Configuration reloaded, changed: %s", changes)
+    if restart_required:
+        logger.warning("Restart needed to apply: %s", restart_required)
+    return changes, restart_required
+
+def reload_all():
+    """ Reloads the configuration and the plugins whose files changed """
+    try:
+        reload_config()
+        plugin_registry.sync(restfulconfig.RestConfig().get_plugin_lazy_load())
+    except Exception as err: # pylint: disable=broad-except
+        restlog.get_logger().error("Reload failed: %s", err)
+
+def handle_reload_signal(*_):
+    # The signal handler runs in the thread accepting the connections, the
+    # plugin imports and the waits for the old requests are done aside
+    thread = threading.Thread(target=reload_all, name="reload")
+    thread.daemon = True
+    thread.start()
+
+def add_admin_handler(handler, *urls):
+    plugin_loader.add_logger(handler)
+    handler.authentication_method = auth_method
+    handler.add_wrappers()
+    logger = restlog.get_logger()
+    for url in urls:
+        logger.debug("Registering %s", url)
+    api.add_resource(handler, *urls)
+
+def add_admin_handlers(config):
+    ConfigReloadHandler.reload_callback = staticmethod(reload_config)
+    ConfigReloadHandler.per_process = config.get_server() == "prefork"
+    add_admin_handler(ConfigReloadHandler, "/admin/reload")
+    PluginAdminHandler.registry = plugin_registry
+    PluginAdminHandler.per_process = config.get_server() == "prefork"
+    add_admin_handler(PluginAdminHandler, "/admin/plugins", "/admin/plugins/<name>")
+    StartupReportHandler.registry = plugin_registry
+    add_admin_handler(StartupReportHandler, "/admin/startup")
+
+def initialize(config, logger):
+    global auth_method, plugin_loader, plugin_registry
+    restlog.configure(config)
+    logger.info("Initializing...")
+    apply_live_config(config)
+    api.representations = serializers.get_representations(config)
     app.register_error_handler(Exception, handle_excp)
+    # Routes the requests of the plugins not loaded yet before the others see the request
+    app.before_request(route_plugin_request)
+    # The after request functions are called in the reverse order, the
+    # logging and the metrics see the response before the compression
+    app.after_request(compress_response)
+    add_metrics(config, logger)
     app.before_request(request_logger)
     app.after_request(response_logger)
+    add_response_cache()
     logger.error("%s", config.get_handler_dir())
-    p = PluginLoader(config.get_handler_dir(), api, config.get_auth_method())
-    auth_handler = p.get_auth_method()
-    handlers = p.get_modules()
-    for handler in handlers:
-        p.init_handler(handler)
-
+    plugin_loader = PluginLoader(config.get_handler_dir(), api, config.get_auth_method())
+    auth_method = plugin_loader.get_auth_method()
+    if config.get_enable_metrics():
+        add_auth_metrics()
     for handler in restlog.get_log_handlers():
         app.logger.addHandler(handler)
-    p.create_api_versionhandlers(handlers)
+    plugin_registry = PluginRegistry(plugin_loader, app, api)
+    add_admin_handlers(config)
+    add_admission_control(config, logger)
+    # The routes of the plugins are changed by replacing the url map, so
+    # the other routes have to be added before. The workers of the prefork
+    # server are forked after initialize, so the plugins have to be ready
+    # by then.
+    background = config.get_plugin_background_init() and config.get_server() != "prefork"
+    warming_retry_after["seconds"] = config.get_retry_after()
+    plugin_registry.load_all(config.get_plugin_init_threads(), background, config.get_plugin_lazy_load(),
+                             config.get_plugin_prewarm())
     logger.info("Starting up...")
 
 
@@ -113,7 +434,14 @@ def main():
     config = get_config(sys.argv[1:], logger)
     if not config:
         raise ConfigError("Failed to read config file")
+    if config.get_server() == "gevent" and not wsgiserver.is_gevent_patched():
+        return wsgiserver.exec_gevent()
     initialize(config, logger)
+    if config.get_server() == "prefork":
+        return wsgiserver.run_prefork(app, config, reload_all)
+    signal.signal(signal.SIGHUP, handle_reload_signal)
+    if config.get_server() == "gevent":
+        return wsgiserver.run_gevent(app, config)
     run_params = {}
     run_params["debug"] = config.get_debug()
     run_params["port"] = config.get_port()
@@ -13,8 +13,17 @@
 # limitations under the License.
 #
 
-from flask import abort, request
+import sys
+import threading
+import time
+from flask import abort, request, g
 from functools import wraps
+import six
+import yarf.metrics as metrics
+
+AUTH_CONTEXT = "yarf_authentication"
+AUTH_VALIDATIONS = "yarf_authentication_validations"
+
 
 def login_required(func):
     @wraps(func)
@@ -23,15 +32,61 @@ def login_required(func):
         if auth_method is None:
             return func(*args, **kwargs)
 
-        if isinstance(auth_method, BaseAuthMethod) and auth_method.get_authentication(request)[0]:
+        if isinstance(auth_method, BaseAuthMethod) and auth_method.authenticate(request)[0]:
             return func(*args, **kwargs)
         else:
             abort(401)
             return None
     return wrapper
 
+
+def get_validation_count():
+    """ Returns the number of backend validations done within the current request
+    """
+    return getattr(g, AUTH_VALIDATIONS, 0)
+
+
+class _Failure(object):
+    """ The exception raised by get_authentication within the request
+    """
+    __slots__ = ("exc_info",)
+
+    def __init__(self, exc_info):
+        self.exc_info = exc_info
+
+
 class BaseAuthMethod(object):
     def __init__(self):
-        pass
+        self.validations = 0
+        self._validations_lock = threading.Lock()
+
+    def authenticate(self, req):
+        """ Returns the authentication result of the request
+            The result of get_authentication is stored to the request context
+            so that every consumer within the same request (login_required,
+            request and response logging) shares one backend validation.
+            An exception is stored as well and raised again to every consumer.
+        """
+        context = getattr(g, AUTH_CONTEXT, None)
+        if context is None:
+            context = {}
+            setattr(g, AUTH_CONTEXT, context)
+        result = context.get(id(self))
+        if result is None:
+            start = time.time()
+            try:
+                result = self.get_authentication(req)
+            except Exception: # pylint: disable=broad-except
+                result = _Failure(sys.exc_info())
+            finally:
+                metrics.AUTH_LATENCY.observe((self.__class__.__name__,), time.time() - start)
+            context[id(self)] = result
+            setattr(g, AUTH_VALIDATIONS, get_validation_count() + 1)
+            with self._validations_lock:
+                self.validations += 1
+        if isinstance(result, _Failure):
+            six.reraise(*result.exc_info)
+        return result
+
     def get_authentication(self, req):
         raise NotImplementedError("Function get_authentication not implemented")
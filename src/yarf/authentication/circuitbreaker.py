@@ -0,0 +1,63 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+
+
+class CircuitBreaker(object):
+    """ Stops calling a failing backend for a while
+        After failure_threshold consecutive failures the breaker opens and
+        allow returns False until reset_timeout seconds have passed. Then one
+        trial call is let through: success closes the breaker and failure
+        opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if not self.failure_threshold:
+            return True
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def get_retry_after(self):
+        return max(1, self.reset_timeout - (time.time() - self.opened_at))
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
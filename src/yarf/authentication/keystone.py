@@ -18,35 +18,82 @@ from keystoneauth1 import session
 from keystoneclient.v3 import client
 from keystoneclient.v3.tokens import TokenManager
 from keystoneauth1.exceptions.http import Unauthorized, NotFound
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+import datetime
 
 import yarf.restfullogger as logger
 
 from yarf.authentication.base_auth import BaseAuthMethod
+from yarf.authentication.circuitbreaker import CircuitBreaker
+from yarf.authentication.singleflight import SingleFlight, SingleFlightTimeout
+from yarf.authentication.tokencache import TokenCache
+from yarf.exceptions import ServiceUnavailable
 from yarf.restfulargs import RestConfig
 
 
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """ HTTPAdapter that uses the given (connect, read) timeout by default
+    """
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super(TimeoutHTTPAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super(TimeoutHTTPAdapter, self).send(request, **kwargs)
+
+
 class KeystoneAuth(BaseAuthMethod):
     def __init__(self):
         super(KeystoneAuth, self).__init__()
         self.logger = logger.get_logger()
-        config = RestConfig()
-        config.parse()
-        conf = config.get_section("keystone", format='dict')
-        try:
-            self.user = conf["user"]
-            self.password = conf["password"]
-            self.uri = conf["auth_uri"] + '/v3'
-            self.domain = "default"
-        except KeyError as error:
-            self.logger.error("Failed to find all the needed parameters. Authentication with Keystone not possible: {}"
-                              .format(str(error)))
+        conf = RestConfig().get_snapshot().keystone
+        self.conf = conf
+        if conf.user is None or conf.password is None or conf.auth_uri is None:
+            self.logger.error("Failed to find all the needed parameters. Authentication with Keystone not possible")
+        self.user = conf.user
+        self.password = conf.password
+        self.uri = "%s/v3" % conf.auth_uri
+        self.domain = "default"
         self.auth = v3.Password(auth_url=self.uri,
                                 username=self.user,
                                 password=self.password,
                                 user_domain_id=self.domain)
-        self.sess = session.Session(auth=self.auth)
+        self.sess = session.Session(auth=self.auth, session=self._get_http_session(conf))
         self.keystone = client.Client(session=self.sess)
         self.tokenmanager = TokenManager(self.keystone)
+        self.token_cache = TokenCache(max_entries=conf.token_cache_size,
+                                      max_ttl=conf.token_cache_ttl,
+                                      negative_ttl=conf.token_cache_negative_ttl,
+                                      revocation_ttl=conf.token_revocation_ttl)
+        self.singleflight = SingleFlight(timeout=conf.validation_timeout)
+        self.service_auth = SingleFlight(timeout=conf.validation_timeout)
+        self.breaker = CircuitBreaker(failure_threshold=conf.breaker_failure_threshold,
+                                      reset_timeout=conf.breaker_reset_timeout)
+
+    @staticmethod
+    def _get_http_session(conf):
+        """ Creates the HTTP session shared by all the request threads
+            The connection pool keeps pool_size connections alive towards
+            Keystone and failed connections are retried with backoff.
+        """
+        retries = Retry(total=conf.retries,
+                        backoff_factor=conf.retry_backoff,
+                        status_forcelist=(502, 503, 504))
+        adapter = TimeoutHTTPAdapter(timeout=(conf.connect_timeout, conf.read_timeout),
+                                     pool_connections=conf.pool_size,
+                                     pool_maxsize=conf.pool_size,
+                                     max_retries=retries)
+        http_session = requests.Session()
+        http_session.mount("http://", adapter)
+        http_session.mount("https://", adapter)
+        if not conf.keep_alive:
+            http_session.headers["Connection"] = "close"
+        return http_session
 
     def get_authentication(self, req):
         try:
@@ -54,19 +101,72 @@ class KeystoneAuth(BaseAuthMethod):
         except KeyError:
             self.logger.error("Failed to get the authentication token from request")
             return (False, "")
+        if not token:
+            return (False, "")
+
+        key = self.token_cache.get_key(token)
+        result = self.token_cache.get(key)
+        if result is not None:
+            return result
+
+        if not self.breaker.allow():
+            self.logger.error("Keystone is not available, failing fast")
+            raise ServiceUnavailable("Authentication service is not available",
+                                     retry_after=self.breaker.get_retry_after())
 
         try:
+            return self.singleflight.do(key, self._validate, key, token)
+        except SingleFlightTimeout:
+            self.logger.error("Timed out waiting for the token validation")
+            return (False, "")
+
+    def _validate(self, key, token):
+        # Another thread may have finished the validation after our cache miss
+        result = self.token_cache.get(key, count=False)
+        if result is not None:
+            return result
+
+        try:
+            self._authenticate_service()
             tokeninfo = self.tokenmanager.validate(token)
         except Unauthorized:
             self.logger.error("Failed to authenticate with given credentials")
+            self.breaker.success()
+            self.token_cache.set(key, (False, ""), negative=True)
             return (False, "")
         except NotFound:
             self.logger.error("Unauthorized token")
+            self.breaker.success()
+            self.token_cache.set(key, (False, ""), negative=True)
             return (False, "")
         except Exception as error:
             self.logger.error("Failure: {}".format(str(error)))
+            self.breaker.failure()
             return (False, "")
+        self.breaker.success()
 
+        result = (False, "")
         if 'admin' in tokeninfo.role_names:
-            return (True, 'admin')
-        return (False, "")
+            result = (True, 'admin')
+        self.token_cache.set(key, result, ttl=self._get_time_to_expiry(tokeninfo))
+        return result
+
+    def _authenticate_service(self):
+        """ Fetches the service token once for all the waiting threads
+            keystoneauth1 fetches it under a lock, so while Keystone hangs
+            the threads would otherwise time out one after the other.
+        """
+        auth_ref = self.auth.auth_ref
+        if auth_ref is None or auth_ref.will_expire_soon(self.auth.MIN_TOKEN_LIFE_SECONDS):
+            self.service_auth.do("service", self.auth.get_access, self.sess)
+
+    @staticmethod
+    def _get_time_to_expiry(tokeninfo):
+        expires = getattr(tokeninfo, "expires", None)
+        if expires is None:
+            return None
+        if expires.tzinfo is None:
+            now = datetime.datetime.utcnow()
+        else:
+            now = datetime.datetime.now(expires.tzinfo)
+        return (expires - now).total_seconds()
@@ -0,0 +1,108 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import os
+import time
+
+try:
+    from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+from yarf.authentication.keystone import KeystoneAuth
+from yarf.exceptions import ConfigError
+
+TOKEN_PREFIX = "yarf:"
+
+
+def generate_key():
+    return Fernet.generate_key()
+
+
+def load_keys(repository):
+    """ Reads the keys from a Keystone style key repository
+        Every file in the directory named with an integer contains one key.
+        The key with the highest index is the primary key used for signing.
+        Returns: list of keys, primary key first
+    """
+    indexes = []
+    for fname in os.listdir(repository):
+        if fname.isdigit():
+            indexes.append(int(fname))
+    keys = []
+    for index in sorted(indexes, reverse=True):
+        with open(os.path.join(repository, str(index))) as f:
+            keys.append(f.read().strip())
+    return keys
+
+
+def issue_token(keys, user, roles, lifetime=3600):
+    """ Creates a token that LocalTokenAuth can validate without Keystone
+        Parameters:
+            keys: list of keys as returned by load_keys
+            user: name of the user
+            roles: list of role names
+            lifetime: validity of the token in seconds
+    """
+    payload = {"user": user, "roles": list(roles), "expires_at": int(time.time() + lifetime)}
+    return MultiFernet([Fernet(key) for key in keys]).encrypt(TOKEN_PREFIX + json.dumps(payload))
+
+
+class LocalTokenAuth(KeystoneAuth):
+    """ Validates the tokens encrypted with locally provisioned Fernet keys
+        Tokens not created with these keys are validated with Keystone.
+    """
+    def __init__(self):
+        super(LocalTokenAuth, self).__init__()
+        if Fernet is None:
+            raise ConfigError("Local token validation needs the cryptography module")
+        repository = self.conf.token_key_repository
+        try:
+            keys = load_keys(repository)
+        except (IOError, OSError) as error:
+            raise ConfigError("Failed to read token keys from %s: %s" % (repository, error))
+        if not keys:
+            raise ConfigError("No token keys found from %s" % repository)
+        self.fernet = MultiFernet([Fernet(key) for key in keys])
+
+    def get_authentication(self, req):
+        token = req.headers.get("X-Auth-Token", type=str)
+        if not token:
+            return (False, "")
+
+        payload = self._decrypt(token)
+        if payload is None:
+            return super(LocalTokenAuth, self).get_authentication(req)
+
+        if payload.get("expires_at", 0) <= time.time():
+            self.logger.error("Expired token")
+            return (False, "")
+        if 'admin' in payload.get("roles", []):
+            return (True, payload.get("user", ""))
+        return (False, "")
+
+    def _decrypt(self, token):
+        try:
+            data = self.fernet.decrypt(token)
+        except InvalidToken:
+            return None
+        if not data.startswith(TOKEN_PREFIX):
+            return None
+        try:
+            return json.loads(data[len(TOKEN_PREFIX):])
+        except ValueError:
+            self.logger.error("Malformed local token")
+            return None
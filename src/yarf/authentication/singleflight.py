@@ -0,0 +1,64 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+
+
+class SingleFlightTimeout(Exception):
+    pass
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """ Coalesces concurrent calls with the same key
+        Only the first caller executes the function, the others wait for
+        its result at most timeout seconds.
+    """
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+
+        if not leader:
+            if not call.event.wait(self.timeout):
+                raise SingleFlightTimeout("Timed out waiting for the ongoing call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.result
@@ -0,0 +1,93 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache(object):
+    """ Bounded LRU cache of token validation results
+        Parameters:
+            max_entries: Maximum amount of cached tokens, 0 disables the cache
+            max_ttl: Maximum time in seconds a validation result is reused
+            negative_ttl: Time in seconds a failed validation is reused
+            revocation_ttl: Optional cap for max_ttl so that revoked tokens
+                            are noticed within this time, 0 means no cap
+    """
+    def __init__(self, max_entries=1000, max_ttl=300, negative_ttl=5, revocation_ttl=0):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        if revocation_ttl:
+            self.max_ttl = min(self.max_ttl, revocation_ttl)
+        self.negative_ttl = min(negative_ttl, self.max_ttl)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def get_key(token):
+        return hashlib.sha256(token).hexdigest()
+
+    def get(self, key, count=True):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += count
+                return None
+            expires, value = entry
+            if expires <= now:
+                self.expirations += 1
+                self.misses += count
+                return None
+            self.entries[key] = entry
+            self.hits += count
+            return value
+
+    def set(self, key, value, ttl=None, negative=False):
+        """ Stores the value for at most max_ttl (negative_ttl for failed
+            validations) or ttl seconds if it is smaller, for example the
+            remaining lifetime of the token
+        """
+        if not self.max_entries:
+            return
+        limit = self.negative_ttl if negative else self.max_ttl
+        if ttl is not None:
+            limit = min(limit, ttl)
+        if limit <= 0:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.time() + limit, value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            return {"entries": len(self.entries),
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "expirations": self.expirations}
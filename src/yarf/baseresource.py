@@ -22,6 +22,7 @@ class BaseResource(Resource):
 #   authentication_method = None
     api_versions = []
     subarea = "none"
+    plugin = None
     parser = None
     logger = None
     
@@ -38,7 +39,7 @@ class BaseResource(Resource):
 
     @classmethod
     def add_parser_arguments(cls):
-        cls.parser = reqparse.RequestParser()
+        cls.parser = reqparse.RequestParser(bundle_errors=True)
         for argument in cls.parser_arguments:
             if isinstance(argument, cls.int_arg_class):
                 cls.parser.add_argument(argument.argument_class)
@@ -0,0 +1,195 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import time
+import zlib
+from flask import request
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import yarf.metrics as metrics
+
+BYTES_IN = metrics.registry.register(metrics.Counter("yarf_compression_input_bytes_total",
+                                                     "Bytes of the responses before compression",
+                                                     ("encoding",)))
+BYTES_OUT = metrics.registry.register(metrics.Counter("yarf_compression_output_bytes_total",
+                                                      "Bytes of the responses after compression",
+                                                      ("encoding",)))
+SECONDS = metrics.registry.register(metrics.Counter("yarf_compression_seconds_total",
+                                                    "Time spent compressing the responses in seconds",
+                                                    ("encoding",)))
+
+
+class GzipCompressor(object):
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor(object):
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor(object):
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdCompressor
+
+settings = {"encodings": [], "min_size": 1024, "level": 6}
+
+
+def to_encodings(value):
+    """ The compression option, checked when the configuration is parsed """
+    encodings = [item.strip() for item in value.split(',') if item.strip()]
+    for encoding in encodings:
+        if encoding not in ("gzip", "br", "zstd"):
+            raise ValueError("unknown compression %s" % encoding)
+    return encodings
+
+
+def to_level(value):
+    level = int(value)
+    if not 1 <= level <= 9:
+        raise ValueError("has to be from 1 to 9")
+    return level
+
+
+def configure(config):
+    """ encodings: the content codings in the order of preference, the
+                   ones whose module is not installed are skipped
+    """
+    settings["encodings"] = [encoding for encoding in config.get_compression() if encoding in COMPRESSORS]
+    settings["min_size"] = config.get_compression_min_size()
+    settings["level"] = config.get_compression_level()
+
+
+def choose_encoding():
+    """ The first configured encoding accepted by the client """
+    for encoding in settings["encodings"]:
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(response, enabled):
+    if not enabled or not settings["encodings"]:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    return not response.direct_passthrough and "Content-Encoding" not in response.headers
+
+
+def record(encoding, size_in, size_out, seconds):
+    labels = (encoding,)
+    BYTES_IN.inc(labels, size_in)
+    BYTES_OUT.inc(labels, size_out)
+    SECONDS.inc(labels, seconds)
+
+
+def compress_data(compressor, encoding, data):
+    start = time.time()
+    compressed = compressor.compress(data) + compressor.flush()
+    record(encoding, len(data), len(compressed), time.time() - start)
+    return compressed
+
+
+class CompressedStream(object):
+    """ Compresses the chunks of a streamed response as they are sent so
+        that the whole body is never held in memory
+    """
+    def __init__(self, iterable, compressor, encoding):
+        self.iterable = iterable
+        self.compressor = compressor
+        self.encoding = encoding
+
+    def __iter__(self):
+        for chunk in self.iterable:
+            if not chunk:
+                continue
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode("utf-8")
+            start = time.time()
+            compressed = self.compressor.compress(chunk)
+            record(self.encoding, len(chunk), len(compressed), time.time() - start)
+            if compressed:
+                yield compressed
+        start = time.time()
+        compressed = self.compressor.flush()
+        record(self.encoding, 0, len(compressed), time.time() - start)
+        yield compressed
+
+    def close(self):
+        close = getattr(self.iterable, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(response, enabled=True):
+    """ Compresses the response with the best encoding accepted by the
+        client
+        enabled: False when the resource opted out of the compression
+    """
+    if not is_compressible(response, enabled):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not response.is_streamed and len(response.get_data()) < settings["min_size"]:
+        return response
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+    compressor = COMPRESSORS[encoding](settings["level"])
+    if response.is_streamed:
+        response.response = CompressedStream(response.response, compressor, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        response.set_data(compress_data(compressor, encoding, response.get_data()))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The body differs from the uncompressed one
+        response.set_etag(etag, weak=True)
+    return response
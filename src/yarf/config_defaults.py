@@ -15,4 +15,20 @@
 
 default_config_file = "/etc/yarf/config.ini"
 default_section = "restframe"
-config_defaults = {"port":"61200", "ip_address": "127.0.0.1", "use_ssl": "False", "handler_directory": '/usr/lib/python2.7/site-packages/yarf/handlers/', "threaded": "True", "passthrough_errors": "True"}
+config_defaults = {"port":"61200", "ip_address": "127.0.0.1", "use_ssl": "False", "handler_directory": '/usr/lib/python2.7/site-packages/yarf/handlers/', "threaded": "True", "passthrough_errors": "True",
+                   "server": "development", "workers": "4", "worker_threads": "1", "backlog": "2048", "max_requests": "0",
+                   "max_requests_jitter": "0", "graceful_timeout": "30", "worker_connections": "1000",
+                   "max_concurrency": "0", "queue_size": "100", "queue_timeout": "5", "retry_after": "1", "subarea_concurrency": "",
+                   "enable_metrics": "True", "log_mode": "sync", "log_queue_size": "10000",
+                   "log_response_body": "False", "log_response_body_sample_rate": "1.0", "log_response_body_max_bytes": "150000",
+                   "secrets": "", "plugin_drain_timeout": "30",
+                   "plugin_scan_threads": "8", "plugin_cache_file": "/var/cache/yarf/plugin-manifests.json",
+                   "plugin_init_threads": "4", "plugin_background_init": "False",
+                   "plugin_lazy_load": "False", "plugin_prewarm": "",
+                   "json_backend": "auto", "json_pretty": "False", "enable_msgpack": "True",
+                   "compression": "zstd,br,gzip", "compression_min_size": "1024", "compression_level": "6",
+                   "response_cache_max_bytes": "67108864",
+                   "pagination_secret": ""}
+keystone_defaults = {"token_cache_size": "1000", "token_cache_ttl": "300", "token_cache_negative_ttl": "5", "token_revocation_ttl": "0", "validation_timeout": "10", "token_key_repository": "/etc/yarf/token-keys",
+                     "pool_size": "10", "keep_alive": "True", "connect_timeout": "3", "read_timeout": "10", "retries": "2", "retry_backoff": "0.2",
+                     "breaker_failure_threshold": "5", "breaker_reset_timeout": "30"}
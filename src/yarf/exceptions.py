@@ -13,6 +13,21 @@
 # limitations under the License.
 #
 
+from werkzeug import exceptions
+
+
 class ConfigError(Exception):
     def __init__(self, message):
         super(ConfigError, self).__init__(message)
+
+
+class ServiceUnavailable(exceptions.ServiceUnavailable):
+    def __init__(self, description=None, retry_after=None):
+        super(ServiceUnavailable, self).__init__(description)
+        self.retry_after = retry_after
+
+    def get_headers(self, *args, **kwargs):
+        headers = exceptions.HTTPException.get_headers(self, *args, **kwargs)
+        if self.retry_after:
+            headers.append(("Retry-After", str(int(self.retry_after))))
+        return headers
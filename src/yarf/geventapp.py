@@ -0,0 +1,37 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# Entry point of the gevent server. The standard library has to be patched
+# before yarf, flask or the logger create any socket, lock or thread, so
+# gevent is patched before anything else is imported.
+
+from gevent import monkey
+monkey.patch_all()
+
+import sys # pylint: disable=wrong-import-position
+
+from yarf import app # pylint: disable=wrong-import-position
+
+
+def main():
+    return app.main()
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    except Exception as error:# pylint: disable=broad-except
+        print "Failure: %s" % error
+        sys.exit(255)
@@ -0,0 +1,104 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import os
+import os.path
+import threading
+import yarf.restfullogger as restlog
+
+CACHE_VERSION = 1
+
+
+def get_dir_signature(directory):
+    """ Name, modification time and size of the .ini and .py files """
+    signature = []
+    for fname in sorted(os.listdir(directory)):
+        if not fname.endswith((".ini", ".py")):
+            continue
+        stat = os.stat(os.path.join(directory, fname))
+        signature.append([fname, stat.st_mtime, stat.st_size])
+    return signature
+
+
+class ManifestCache(object):
+    """ Keeps the manifests of the plugin directories in a JSON file
+        A manifest is used while the .ini and .py files of its directory
+        have the same modification times and sizes as when it was stored.
+    """
+    def __init__(self, path):
+        self.logger = restlog.get_logger()
+        self.path = path
+        self.lock = threading.Lock()
+        self.directories = None
+        self.changed = False
+
+    def _load(self):
+        self.directories = {}
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as cache_file:
+                content = json.load(cache_file)
+        except (IOError, ValueError) as error:
+            self.logger.warning("Ignoring the plugin manifest cache %s: %s", self.path, error)
+            return
+        if content.get("version") == CACHE_VERSION:
+            self.directories = content.get("directories", {})
+
+    def get(self, directory, signature):
+        with self.lock:
+            if self.directories is None:
+                self._load()
+            entry = self.directories.get(directory)
+        if entry is None or entry["signature"] != signature:
+            return None
+        return entry["manifest"]
+
+    def set(self, directory, signature, manifest):
+        with self.lock:
+            if self.directories is None:
+                self._load()
+            self.directories[directory] = {"signature": signature, "manifest": manifest}
+            self.changed = True
+
+    def prune(self, directories):
+        """ Forgets the directories that are not in the list """
+        with self.lock:
+            if self.directories is None:
+                self._load()
+            for directory in list(self.directories.keys()):
+                if directory not in directories:
+                    del self.directories[directory]
+                    self.changed = True
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            if not self.changed:
+                return
+            content = {"version": CACHE_VERSION, "directories": self.directories}
+            tmp_path = "%s.%d" % (self.path, os.getpid())
+            try:
+                cache_dir = os.path.dirname(self.path)
+                if cache_dir and not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                with open(tmp_path, "w") as cache_file:
+                    json.dump(content, cache_file, separators=(",", ":"))
+                os.rename(tmp_path, self.path)
+                self.changed = False
+            except (IOError, OSError) as error:
+                self.logger.warning("Failed to write the plugin manifest cache %s: %s", self.path, error)
@@ -15,22 +15,32 @@
 
 import os
 import os.path
+import re
 import sys
 import inspect
+from multiprocessing.pool import ThreadPool
 from yarf.iniloader import INILoader
 from yarf.restresource import RestResource
 from yarf.versionhandler import VersionHandler
 from yarf.authentication.base_auth import BaseAuthMethod
+from yarf.handlers.manifestcache import ManifestCache, get_dir_signature
 from yarf.exceptions import ConfigError
+from yarf.helpers import scrubber
+from yarf.restfulargs import get_snapshot
 import yarf.restfullogger as restlog
 
+# Top level class definitions of a plugin module
+CLASS_PATTERN = re.compile(r"^class\s+(\w+)", re.MULTILINE)
+
 class PluginLoader(object):
     def __init__(self, path, api, auth_method):
         self.logger = restlog.get_logger()
         self.plugin_class_type = RestResource
         self.auth_method = self._get_auth_method(auth_method)
+        self.auth_instance = None
         self.path = path
         self.api = api
+        self.manifest_cache = ManifestCache(get_snapshot().plugin_cache_file)
 
     def get_module_dirs(self):
         files = os.listdir(self.path)
@@ -77,6 +87,17 @@ class PluginLoader(object):
                 classes.append(itm)
         return classes
 
+    def _get_class(self, module_name, class_name):
+        try:
+            __import__(module_name)
+        except ImportError:
+            self.logger.error("Failed import in %s, skipping", module_name)
+            return None
+        itm = getattr(sys.modules[module_name], class_name, None)
+        if inspect.isclass(itm) and issubclass(itm, self.plugin_class_type) and itm is not self.plugin_class_type:
+            return itm
+        return None
+
     def get_classes_from_dir(self, directory, wanted_modules):
         classes = []
         if directory not in sys.path:
@@ -110,52 +131,173 @@ class PluginLoader(object):
         return modules
 
     def get_auth_method(self):
-        return self.auth_method()
+        if self.auth_instance is None:
+            self.auth_instance = self.auth_method()
+        return self.auth_instance
+
+    def replace_auth_method(self, auth_method, handlers):
+        """ Creates a new authentication object and gives it to the handlers
+            that use the one of the framework
+            Returns: the new authentication object
+        """
+        old_instance = self.auth_instance
+        auth_class = self._get_auth_method(auth_method)
+        new_instance = auth_class()
+        for handler in handlers:
+            if vars(handler).get("authentication_method") is old_instance:
+                setattr(handler, "authentication_method", new_instance)
+        self.auth_method = auth_class
+        self.auth_instance = new_instance
+        return new_instance
 
     def get_modules(self):
         dirs = self.get_module_dirs()
-        auth_class = self.auth_method()
+        manifests = self.scan_dirs(dirs)
+        self.manifest_cache.prune(dirs)
+        self.manifest_cache.save()
         modules = []
         for d in dirs:
-            wanted_modules = self.get_modules_from_dir(d)
-            for mod in wanted_modules.keys():
-                for api_version in wanted_modules[mod].keys():
-                    classes = self.get_classes_from_dir(d, wanted_modules[mod][api_version])
-                    if not classes:
-                        continue
-                    for c in classes:
-                        setattr(c, "subarea", mod)
-                        if getattr(c, "authentication_method", "EMPTY") == "EMPTY":
-                            setattr(c, "authentication_method", auth_class)
-                        if getattr(c, "api_versions", None):
-                            c.api_versions.append(api_version)
-                        else:
-                            setattr(c, "api_versions", [api_version])
-                    for cls in classes:
-                        if cls not in modules:
-                            modules.append(cls)
+            for cls in self.get_modules_in_dir(d, manifests[d]):
+                if cls not in modules:
+                    modules.append(cls)
         return modules
 
-    def create_endpoints(self, handler):
+    def scan_dirs(self, dirs):
+        """ Reads the manifests of the plugin directories in parallel
+            Returns: dictionary of the manifests by directory
+        """
+        if len(dirs) < 2:
+            return dict((d, self.scan_dir(d)) for d in dirs)
+        pool = ThreadPool(min(len(dirs), get_snapshot().plugin_scan_threads))
+        try:
+            return dict(zip(dirs, pool.map(self.scan_dir, dirs)))
+        finally:
+            pool.close()
+
+    def scan_dir(self, module_dir):
+        """ Returns the cached manifest of a plugin directory or builds it
+            when its files changed
+        """
+        signature = get_dir_signature(module_dir)
+        manifest = self.manifest_cache.get(module_dir, signature)
+        if manifest is None:
+            manifest = self.build_manifest(module_dir)
+            self.manifest_cache.set(module_dir, signature, manifest)
+        return manifest
+
+    def build_manifest(self, module_dir):
+        """ Builds the manifest of a plugin directory without importing it
+            The handlers in the .ini files are either class names or
+            module:class pairs. The modules of the class names are found by
+            searching the class definitions from the sources.
+            Returns: dictionary with the wanted handlers of the .ini files
+                     ("subareas") and the module of each class ("classes")
+        """
+        subareas = self.get_modules_from_dir(module_dir)
+        classes = {}
+        wanted = set()
+        for versions in subareas.values():
+            for handlers in versions.values():
+                for handler in handlers:
+                    module_name, _, class_name = handler.strip().rpartition(":")
+                    if module_name:
+                        classes[class_name] = module_name
+                    else:
+                        wanted.add(class_name)
+        wanted.difference_update(classes.keys())
+        if wanted:
+            for fname in sorted(os.listdir(module_dir)):
+                root, ext = os.path.splitext(fname)
+                if ext != '.py' or root == '__init__':
+                    continue
+                with open(os.path.join(module_dir, fname)) as source:
+                    for class_name in CLASS_PATTERN.findall(source.read()):
+                        if class_name in wanted and class_name not in classes:
+                            classes[class_name] = root
+        return {"subareas": subareas, "classes": classes}
+
+    def get_classes_from_manifest(self, directory, manifest, wanted_modules):
+        classes = []
+        for handler in wanted_modules:
+            class_name = handler.strip().rpartition(":")[2]
+            module_name = manifest["classes"].get(class_name)
+            if module_name is None:
+                # Not defined in the sources, for example created or imported
+                # from elsewhere, so search the imported modules
+                self.logger.debug("No definition found for %s in %s", class_name, directory)
+                classes.extend(self.get_classes_from_dir(directory, [class_name]))
+                continue
+            if directory not in sys.path:
+                sys.path.append(directory)
+            cls = self._get_class(module_name, class_name)
+            if cls is not None:
+                classes.append(cls)
+            else:
+                self.logger.error("Cannot find %s in module %s", class_name, module_name)
+        return classes
+
+    def get_modules_in_dir(self, module_dir, manifest=None):
+        if manifest is None:
+            manifest = self.scan_dir(module_dir)
+        auth_class = self.get_auth_method()
+        plugin = os.path.basename(module_dir)
+        modules = []
+        wanted_modules = manifest["subareas"]
+        for mod in wanted_modules.keys():
+            for api_version in wanted_modules[mod].keys():
+                classes = self.get_classes_from_manifest(module_dir, manifest, wanted_modules[mod][api_version])
+                if not classes:
+                    continue
+                for c in classes:
+                    setattr(c, "subarea", mod)
+                    setattr(c, "plugin", plugin)
+                    if getattr(c, "authentication_method", "EMPTY") == "EMPTY":
+                        setattr(c, "authentication_method", auth_class)
+                    if getattr(c, "api_versions", None):
+                        c.api_versions.append(api_version)
+                    else:
+                        setattr(c, "api_versions", [api_version])
+                for cls in classes:
+                    if cls not in modules:
+                        modules.append(cls)
+        return modules
+
+    def forget_modules(self, module_dir):
+        """ Removes the python modules of the directory from sys.modules so
+            that the next load imports them again
+        """
+        for fname in os.listdir(module_dir):
+            root, ext = os.path.splitext(fname)
+            if ext == '.py' and root != '__init__':
+                sys.modules.pop(root, None)
+
+    def get_endpoint_urls(self, handler):
         endpoint_list = []
         for endpoint in handler.endpoints:
             for api_version in handler.api_versions:
                 self.logger.debug("Registering /%s/%s/%s for %s", handler.subarea, api_version, endpoint, handler.__name__)
                 endpoint_list.append("/%s/%s/%s"% (handler.subarea, api_version, endpoint))
-        self.api.add_resource(handler, *(endpoint_list))
+        return endpoint_list
+
+    def create_endpoints(self, handler):
+        self.api.add_resource(handler, *(self.get_endpoint_urls(handler)))
 
     def add_logger(self, handler):
         self.logger.info("Adding logger to: %s", handler.__name__)
         handler.logger = self.logger
 
-    def init_handler(self, handler):
-
+    def prepare_handler(self, handler):
         self.add_logger(handler)
+        if handler.secret_arguments:
+            scrubber.add_secrets(handler.secret_arguments)
         handler.add_wrappers()
-        self.create_endpoints(handler)
         handler.add_parser_arguments()
 
-    def create_api_versionhandlers(self, handlers):
+    def init_handler(self, handler):
+        self.prepare_handler(handler)
+        self.create_endpoints(handler)
+
+    def get_api_versions(self, handlers):
         apiversions = {}
         endpoint_list = []
         for handler in handlers:
@@ -165,9 +307,13 @@ class PluginLoader(object):
                     if hapiversion not in apiversions[subarea]:
                         apiversions[subarea].append(hapiversion)
             else:
-                apiversions[subarea] = handler.api_versions
+                apiversions[subarea] = list(handler.api_versions)
                 self.logger.debug("Registering /%s/apis for %s", subarea, subarea)
                 endpoint_list.append("/%s/apis" % subarea)
+        return apiversions, endpoint_list
+
+    def create_api_versionhandlers(self, handlers):
+        apiversions, endpoint_list = self.get_api_versions(handlers)
         setattr(VersionHandler, "versions", apiversions)
         setattr(VersionHandler, "method_decorators", [])
         self.api.add_resource(VersionHandler, *(endpoint_list))
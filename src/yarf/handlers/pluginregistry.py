@@ -0,0 +1,388 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import functools
+import os.path
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from imp import acquire_lock as acquire_import_lock, release_lock as release_import_lock
+from yarf.exceptions import ConfigError
+from yarf.handlers.manifestcache import get_dir_signature
+from yarf.responsecache import response_cache
+from yarf.restfulargs import get_snapshot
+from yarf.versionhandler import VersionHandler
+import yarf.restfullogger as restlog
+
+VERSION_ENDPOINT = "versionhandler"
+
+
+class DrainCounter(object):
+    """ Counts the requests executing the view of one endpoint """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = 0
+
+    def wrap(self, view):
+        @functools.wraps(view)
+        def counted_view(*args, **kwargs):
+            with self.condition:
+                self.active += 1
+            try:
+                return view(*args, **kwargs)
+            finally:
+                with self.condition:
+                    self.active -= 1
+                    if not self.active:
+                        self.condition.notify_all()
+        return counted_view
+
+    def wait(self, deadline):
+        with self.condition:
+            while self.active:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+
+class PluginRegistry(object):
+    """ Loads, reloads and unloads the plugins while the server is running
+        A plugin is one directory under the handler directory. The routes of
+        the plugin are replaced by building a new url map and swapping it to
+        the application, so a request is routed either to the old or to the
+        new handlers. The requests executing the old handlers are waited for
+        plugin_drain_timeout seconds without holding the lock, their views
+        are removed on the next change. The import and initialization time of every plugin is kept
+        in a report. Routes added with Api.add_resource after the registry
+        has loaded plugins are lost on the next change.
+    """
+    def __init__(self, loader, app, api):
+        self.logger = restlog.get_logger()
+        self.loader = loader
+        self.app = app
+        self.api = api
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.plugins = {}
+        self.counters = {}
+        self.retired = []
+        self.report = {}
+        self.warming = {}
+        self.lazy = {}
+        self.lazy_lock = threading.Lock()
+        self.signatures = {}
+        self.sync_lock = threading.Lock()
+        self.started = None
+        self.startup_time = None
+
+    def load_all(self, threads, background=False, lazy=False, prewarm=()):
+        """ Loads all the plugins with a pool of threads
+            The subareas of a plugin are warming until it is loaded, a plugin
+            that fails to load does not stop the others.
+            background: return at once and let the plugins load while the
+                        server is already serving
+            lazy: load a plugin only on the first request to one of its
+                  subareas, except the plugins or subareas in prewarm
+        """
+        self.started = time.time()
+        dirs = self.loader.get_module_dirs()
+        manifests = self.loader.scan_dirs(dirs)
+        self.loader.manifest_cache.prune(dirs)
+        self.loader.manifest_cache.save()
+        names = []
+        for directory in dirs:
+            name = os.path.basename(directory)
+            subareas = sorted(manifests[directory]["subareas"].keys())
+            if lazy and name not in prewarm and not set(subareas) & set(prewarm):
+                self._set_lazy(name, subareas)
+                continue
+            self.report[name] = {"state": "warming", "subareas": subareas}
+            for subarea in subareas:
+                self.warming[subarea] = name
+            names.append(name)
+        pool = ThreadPool(max(1, min(len(names), threads)))
+        pool.map_async(self._load_contained, names)
+        pool.close()
+        if background:
+            thread = threading.Thread(target=self._finish_startup, args=(pool,), name="plugin-init")
+            thread.daemon = True
+            thread.start()
+        else:
+            self._finish_startup(pool)
+
+    def _set_lazy(self, name, subareas):
+        self.report[name] = {"state": "lazy", "subareas": subareas}
+        for subarea in subareas:
+            self.lazy[subarea] = name
+
+    def load_on_demand(self, subarea):
+        """ Loads the plugin of a lazy subarea, once even if many requests
+            to the subarea arrive at the same time
+            Returns: True if the subarea was lazy
+        """
+        if subarea not in self.lazy:
+            return False
+        with self.lazy_lock:
+            name = self.lazy.get(subarea)
+            if name is None:
+                return True
+            try:
+                self.load(name)
+            except ConfigError as error:
+                self.logger.error("%s", error)
+            finally:
+                for lazy_subarea, lazy_name in list(self.lazy.items()):
+                    if lazy_name == name:
+                        del self.lazy[lazy_subarea]
+        return True
+
+    def _load_contained(self, name):
+        try:
+            self.load(name)
+        except ConfigError as error:
+            self.logger.error("%s", error)
+        finally:
+            for subarea in self.report[name]["subareas"]:
+                if self.warming.get(subarea) == name:
+                    del self.warming[subarea]
+
+    def _finish_startup(self, pool):
+        pool.join()
+        self.startup_time = time.time() - self.started
+        failed = [name for name, entry in self.report.items() if entry["state"] == "failed"]
+        ready = [name for name, entry in self.report.items() if entry["state"] == "ready"]
+        slowest = sorted(self.report.items(), key=lambda item: -item[1].get("import_time", 0) - item[1].get("init_time", 0))
+        self.logger.info("Loaded %d plugins in %.3f s, lazy: %d, failed: %s, slowest: %s", len(ready),
+                         self.startup_time, len(self.report) - len(ready) - len(failed), failed,
+                         ", ".join("%s %.3f s" % (name, entry.get("import_time", 0) + entry.get("init_time", 0))
+                                   for name, entry in slowest[:5]))
+
+    def is_warming(self, subarea):
+        return subarea in self.warming
+
+    def get_report(self):
+        return {"startup_time": self.startup_time, "warming": sorted(self.warming.keys()),
+                "lazy": sorted(self.lazy.keys()),
+                "plugins": dict((name, dict(entry)) for name, entry in self.report.items())}
+
+    def get_handlers(self):
+        return [handler for handlers in self.plugins.values() for handler in handlers]
+
+    def get_plugins(self):
+        return dict((name, sorted(set(handler.subarea for handler in handlers)))
+                    for name, handlers in self.plugins.items())
+
+    def get_plugin_names(self):
+        return [os.path.basename(directory) for directory in self.loader.get_module_dirs()]
+
+    def load(self, name):
+        """ Loads a new plugin or reloads a loaded one
+            Returns: True if the requests to the old handlers finished
+        """
+        directory = os.path.join(self.loader.path, name)
+        if name not in self.get_plugin_names():
+            raise ConfigError("No such plugin %s" % name)
+        entry = self.report.setdefault(name, {"subareas": []})
+        entry["state"] = "loading"
+        signature = get_dir_signature(directory)
+        # The times are taken only after the locks are held, so that a
+        # plugin waiting for the import of another one is not reported slow.
+        # With python 2 every import statement takes the import lock, also
+        # the ones of werkzeug when the routes are compiled.
+        try:
+            acquire_import_lock()
+            try:
+                start = time.time()
+                self.loader.forget_modules(directory)
+                handlers = self.loader.get_modules_in_dir(directory)
+                entry["import_time"] = time.time() - start
+            finally:
+                release_import_lock()
+            if not handlers:
+                raise ConfigError("No handlers found")
+            start = time.time()
+            for handler in handlers:
+                self.loader.prepare_handler(handler)
+            init_time = time.time() - start
+        except Exception as error: # pylint: disable=broad-except
+            entry.update(state="failed", error=str(error))
+            raise ConfigError("Failed to load plugin %s: %s" % (name, error))
+        self.loader.manifest_cache.save()
+        with self.lock:
+            self.logger.info("Loading plugin %s", name)
+            acquire_import_lock()
+            try:
+                start = time.time()
+                old_handlers, counters = self._replace(name, handlers)
+                init_time += time.time() - start
+            finally:
+                release_import_lock()
+            self.signatures[name] = signature
+        entry.update(state="ready", error=None, init_time=init_time,
+                     subareas=sorted(set(handler.subarea for handler in handlers)))
+        return self._drain(name, old_handlers, counters)
+
+    def unload(self, name):
+        """ Removes the routes of a plugin
+            Returns: True if the requests to the old handlers finished
+        """
+        with self.lock:
+            if name not in self.plugins:
+                raise ConfigError("Plugin %s is not loaded" % name)
+            self.logger.info("Unloading plugin %s", name)
+            self.report.pop(name, None)
+            self.signatures.pop(name, None)
+            old_handlers, counters = self._replace(name, [])
+        return self._drain(name, old_handlers, counters)
+
+    def sync(self, lazy=False):
+        """ Unloads the removed plugin directories, reloads the plugins whose
+            .ini or .py files changed and loads the new ones
+            lazy: the plugins not loaded yet are loaded on the first request
+        """
+        with self.sync_lock:
+            names = self.get_plugin_names()
+            for name in list(self.plugins.keys()):
+                if name not in names:
+                    self.unload(name)
+            with self.lazy_lock:
+                self.lazy.clear()
+            for name in names:
+                directory = os.path.join(self.loader.path, name)
+                if name in self.plugins and self.signatures.get(name) == get_dir_signature(directory):
+                    continue
+                if lazy and name not in self.plugins:
+                    self._set_lazy(name, sorted(self.loader.scan_dir(directory)["subareas"].keys()))
+                    continue
+                try:
+                    self.load(name)
+                except ConfigError as error:
+                    self.logger.error("Failed to load plugin %s: %s", name, error)
+
+    def _count(self, endpoint, view):
+        counter = self.counters[endpoint] = DrainCounter()
+        view = counter.wrap(view)
+        self.app.view_functions[endpoint] = view
+        return view
+
+    def _make_view(self, handler, endpoint):
+        # Same as flask_restful.Api.add_resource without adding the routes
+        handler.mediatypes = self.api.mediatypes_method()
+        handler.endpoint = endpoint
+        view = self.api.output(handler.as_view(endpoint))
+        for decorator in self.api.decorators:
+            view = decorator(view)
+        self.api.endpoints.add(endpoint)
+        return view
+
+    def _make_rule(self, url, endpoint, view):
+        # Same as flask.Flask.add_url_rule without modifying the url map
+        methods = set(method.upper() for method in getattr(view, "methods", None) or ("GET",))
+        required_methods = set(getattr(view, "required_methods", ()))
+        provide_automatic_options = getattr(view, "provide_automatic_options", None)
+        if provide_automatic_options is None:
+            provide_automatic_options = "OPTIONS" not in methods
+            if provide_automatic_options:
+                required_methods.add("OPTIONS")
+        rule = self.app.url_rule_class(self.api.prefix + url, methods=methods | required_methods,
+                                       endpoint=endpoint)
+        rule.provide_automatic_options = provide_automatic_options
+        return rule
+
+    def _copy_url_map(self, removed):
+        old_map = self.app.url_map
+        url_map = self.app.url_map_class(default_subdomain=old_map.default_subdomain, charset=old_map.charset,
+                                         strict_slashes=old_map.strict_slashes,
+                                         redirect_defaults=old_map.redirect_defaults,
+                                         encoding_errors=old_map.encoding_errors,
+                                         host_matching=old_map.host_matching)
+        url_map.converters = old_map.converters.copy()
+        for rule in old_map.iter_rules():
+            if rule.endpoint in removed:
+                continue
+            new_rule = rule.empty()
+            new_rule.provide_automatic_options = getattr(rule, "provide_automatic_options", False)
+            url_map.add(new_rule)
+        return url_map
+
+    def _remove_retired(self):
+        retired = []
+        for endpoint in self.retired:
+            if endpoint in self.counters and self.counters[endpoint].active:
+                retired.append(endpoint)
+                continue
+            self.app.view_functions.pop(endpoint, None)
+            self.api.endpoints.discard(endpoint)
+            self.counters.pop(endpoint, None)
+        self.retired = retired
+
+    def _replace(self, name, handlers):
+        """ Swaps the routes of the plugin to the handlers
+            Returns: the old handlers and the counters of their endpoints
+        """
+        self._remove_retired()
+        self.generation += 1
+        old_handlers = self.plugins.get(name, [])
+        removed = set(handler.endpoint for handler in old_handlers)
+        removed.add(VERSION_ENDPOINT)
+        url_map = self._copy_url_map(removed)
+
+        views = {}
+        for handler in handlers:
+            endpoint = "%s@%d" % (handler.__name__.lower(), self.generation)
+            view = self._make_view(handler, endpoint)
+            views[endpoint] = view
+            for url in self.loader.get_endpoint_urls(handler):
+                url_map.add(self._make_rule(url, endpoint, view))
+
+        remaining = [handler for handler in self.get_handlers() if handler.plugin != name] + handlers
+        versions, version_urls = self.loader.get_api_versions(remaining)
+        version_view = self.app.view_functions.get(VERSION_ENDPOINT)
+        if version_view is None:
+            setattr(VersionHandler, "method_decorators", [])
+            version_view = self.app.view_functions[VERSION_ENDPOINT] = self._make_view(VersionHandler,
+                                                                                       VERSION_ENDPOINT)
+        for url in version_urls:
+            url_map.add(self._make_rule(url, VERSION_ENDPOINT, version_view))
+
+        for endpoint, view in views.items():
+            self._count(endpoint, view)
+        setattr(VersionHandler, "versions", versions)
+        self.app.url_map = url_map
+        if handlers:
+            self.plugins[name] = handlers
+        else:
+            self.plugins.pop(name, None)
+
+        removed.discard(VERSION_ENDPOINT)
+        self.retired.extend(removed)
+        return old_handlers, [self.counters[endpoint] for endpoint in removed if endpoint in self.counters]
+
+    def _drain(self, name, old_handlers, counters):
+        """ Waits for the requests executing the old handlers and removes
+            their cached responses
+            Returns: True if they finished within plugin_drain_timeout
+        """
+        deadline = time.time() + get_snapshot().plugin_drain_timeout
+        drained = True
+        for counter in counters:
+            drained = counter.wait(deadline) and drained
+        if not drained:
+            self.logger.warning("Requests to the old handlers of plugin %s still running", name)
+        for handler in old_handlers:
+            response_cache.invalidate(resource=handler)
+        return drained
@@ -14,14 +14,116 @@
 #
 
 import re
+import threading
 
 SECRETS = ["password", "community-string"]
+SECRET_HEADERS = ["X-Auth-Token", "Authorization", "Cookie"]
+MASK = "*****"
+
+
+class SecretScrubber(object):
+    """ Hides the secrets from the logged requests
+        The secret names are combined to one precompiled pattern so a
+        query string is scrubbed in one pass. The plugins add their secrets
+        from the threads loading them, the changes are serialized so that
+        no name is lost.
+    """
+    def __init__(self, secrets=None, headers=None):
+        self.secrets = frozenset()
+        self.fixed_secrets = set()
+        self.configured_secrets = set()
+        self.headers = set(header.lower() for header in (headers or SECRET_HEADERS))
+        self.pattern = None
+        self.lock = threading.Lock()
+        self.add_secrets(secrets or SECRETS)
+
+    def add_secrets(self, secrets):
+        with self.lock:
+            self.fixed_secrets.update(secret.strip() for secret in secrets if secret.strip())
+            self._compile()
+
+    def configure(self, secrets):
+        """ Replaces the secrets coming from the configuration
+            The built-in and plugin secrets stay in use.
+        """
+        with self.lock:
+            self.configured_secrets = set(secret.strip() for secret in secrets if secret.strip())
+            self._compile()
+
+    def _compile(self):
+        secrets = self.fixed_secrets | self.configured_secrets
+        names = sorted(secrets, key=len, reverse=True)
+        self.pattern = re.compile(r'(%s)=[^&]*' % "|".join(re.escape(name) for name in names))
+        self.secrets = frozenset(secrets)
+
+    def scrub_path(self, path):
+        if "=" not in path:
+            return path
+        return self.pattern.sub(r"\1=" + MASK, path)
+
+    def scrub_data(self, data):
+        if isinstance(data, dict):
+            scrubbed = {}
+            for key, value in data.items():
+                if key in self.secrets:
+                    scrubbed[key] = MASK
+                else:
+                    scrubbed[key] = self.scrub_data(value)
+            return scrubbed
+        if isinstance(data, list):
+            return [self.scrub_data(value) for value in data]
+        return data
+
+    def scrub_headers(self, headers):
+        scrubbed = []
+        for key, value in headers:
+            if key.lower() in self.headers or key in self.secrets:
+                value = MASK
+            scrubbed.append((key, value))
+        return scrubbed
+
+
+scrubber = SecretScrubber()
 
 
 def remove_secrets(endpoint):
-    for secret in SECRETS:
-        endpoint = re.sub(r'%s=(.[^&]*)' % secret, "%s=*****" % secret, endpoint)
-    return endpoint
+    return scrubber.scrub_path(endpoint)
+
+
+class ResponseTee(object):
+    """ Passes a streamed response through keeping a copy of its first bytes
+        The callback is called with the copied bytes and a flag telling
+        if the response was longer, when the response has been sent.
+    """
+    def __init__(self, iterable, max_bytes, callback):
+        self.iterable = iterable
+        self.max_bytes = max_bytes
+        self.callback = callback
+        self.chunks = []
+        self.length = 0
+        self.truncated = False
+        self.done = False
 
+    def __iter__(self):
+        for chunk in self.iterable:
+            if self.length < self.max_bytes:
+                part = chunk[:self.max_bytes - self.length]
+                self.chunks.append(part)
+                self.length += len(part)
+                self.truncated = len(part) < len(chunk)
+            elif chunk:
+                self.truncated = True
+            yield chunk
+        self._finish()
 
+    def close(self):
+        close = getattr(self.iterable, "close", None)
+        if close is not None:
+            close()
+        self._finish()
 
+    def _finish(self):
+        if self.done:
+            return
+        self.done = True
+        self.callback(b"".join(self.chunks), self.truncated)
@@ -18,6 +18,8 @@ from yarf.exceptions import ConfigError
 
 
 class INILoader(dict):
+    BOOLEAN_STATES = configparser.ConfigParser.BOOLEAN_STATES
+
     def __init__(self, inifile, defaults=None, defaultsection=None):
         super(INILoader, self).__init__(self)
         self.inifile = inifile
@@ -0,0 +1,236 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import itertools
+import os
+import threading
+import six
+
+SHARDS = 16
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# The thread idents are aligned addresses, so the shards are given to the
+# threads in turn when they first record a value
+_thread_shard = threading.local()
+_shard_counter = itertools.count()
+
+
+def get_shard_index():
+    try:
+        return _thread_shard.index
+    except AttributeError:
+        _thread_shard.index = next(_shard_counter) % SHARDS
+        return _thread_shard.index
+
+
+class _Shard(object):
+    __slots__ = ("lock", "values")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+
+class Metric(object):
+    """ Base for the metrics
+        The values are spread to shards selected by the thread so that the
+        recording threads rarely wait for the same lock. The shards are
+        summed up only when the metrics are rendered.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.shards = [_Shard() for _ in range(SHARDS)]
+
+    def _get_shard(self):
+        return self.shards[get_shard_index()]
+
+    def _add(self, labels, amount):
+        shard = self._get_shard()
+        with shard.lock:
+            shard.values[labels] = shard.values.get(labels, 0) + amount
+
+    def _merge(self):
+        merged = {}
+        for shard in self.shards:
+            with shard.lock:
+                items = list(shard.values.items())
+            for labels, value in items:
+                merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+    def collect(self):
+        samples = []
+        for labels, value in sorted(self._merge().items()):
+            samples.append((self.name, dict(zip(self.labelnames, labels)), value))
+        return [(self.name, self.kind, self.documentation, samples)]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        self._add(labels, amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        self._add(labels, amount)
+
+    def dec(self, labels=(), amount=1):
+        self._add(labels, -amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        shard = self._get_shard()
+        with shard.lock:
+            data = shard.values.get(labels)
+            if data is None:
+                data = shard.values[labels] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+                    break
+            data[-2] += value
+            data[-1] += 1
+
+    def _merge(self):
+        merged = {}
+        for shard in self.shards:
+            with shard.lock:
+                items = [(labels, list(data)) for labels, data in shard.values.items()]
+            for labels, data in items:
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = data
+                else:
+                    merged[labels] = [a + b for a, b in zip(total, data)]
+        return merged
+
+    def collect(self):
+        samples = []
+        for labels, data in sorted(self._merge().items()):
+            labeldict = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for index, bound in enumerate(self.buckets):
+                cumulative += data[index]
+                samples.append((self.name + "_bucket", dict(labeldict, le=repr(bound)), cumulative))
+            samples.append((self.name + "_bucket", dict(labeldict, le="+Inf"), data[-1]))
+            samples.append((self.name + "_sum", labeldict, data[-2]))
+            samples.append((self.name + "_count", labeldict, data[-1]))
+        return [(self.name, self.kind, self.documentation, samples)]
+
+
+class Registry(object):
+    """ Collection of the metrics rendered in the text exposition format
+        Collectors are functions returning the same format as
+        Metric.collect for values that are kept elsewhere (for example
+        cache statistics).
+    """
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self.worker_label = False
+        self.lock = threading.Lock()
+
+    def add_worker_label(self):
+        """ Labels every sample with the pid of the rendering process
+            The pre-forked workers keep their own values, with the label
+            every worker is a series of its own instead of one series
+            jumping between the workers.
+        """
+        self.worker_label = True
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        with self.lock:
+            self.collectors.append(collector)
+
+    def collect(self):
+        with self.lock:
+            sources = [metric.collect for metric in self.metrics] + list(self.collectors)
+        families = []
+        for source in sources:
+            families.extend(source())
+        return families
+
+    def render(self):
+        worker = {"worker": str(os.getpid())} if self.worker_label else {}
+        lines = []
+        for name, kind, documentation, samples in self.collect():
+            lines.append("# HELP %s %s" % (name, documentation))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for sample_name, labels, value in samples:
+                if worker:
+                    labels = dict(labels, **worker)
+                lines.append("%s%s %s" % (sample_name, _format_labels(labels), _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key in sorted(labels):
+        value = six.text_type(labels[key]).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append('%s="%s"' % (key, value))
+    return "{%s}" % ",".join(pairs)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def simple_collector(name, kind, documentation, func, labelnames=()):
+    """ Creates a collector from a function returning {labels tuple: value}
+    """
+    def collector():
+        samples = []
+        for labels, value in sorted(func().items()):
+            samples.append((name, dict(zip(labelnames, labels)), value))
+        return [(name, kind, documentation, samples)]
+    return collector
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter("yarf_requests_total", "Amount of handled requests",
+                                     ("subarea", "version", "endpoint", "method", "status")))
+IN_FLIGHT = registry.register(Gauge("yarf_requests_in_flight", "Amount of requests in execution",
+                                    ("subarea",)))
+LATENCY = registry.register(Histogram("yarf_request_duration_seconds", "Request handling time in seconds",
+                                      ("subarea", "version", "endpoint")))
+AUTH_LATENCY = registry.register(Histogram("yarf_authentication_duration_seconds",
+                                           "Authentication time in seconds", ("method",)))
@@ -0,0 +1,148 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import os
+from flask import request
+from werkzeug.urls import url_encode
+
+CURSOR_ARGUMENT = "cursor"
+LIMIT_ARGUMENT = "limit"
+MAC_BYTES = 16
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def b64decode(data):
+    data = data.encode("ascii")
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+class CursorSigner(object):
+    """ Encodes the position of a page to an opaque cursor
+        The cursor is the JSON of the position and a HMAC of it and of the
+        path so that the clients can neither forge a cursor nor use it for
+        another resource.
+    """
+    def __init__(self, secret):
+        self.secret = secret
+
+    def get_mac(self, payload, path):
+        mac = hmac.new(self.secret, payload + b"\0" + path.encode("utf-8"), hashlib.sha256)
+        return mac.digest()[:MAC_BYTES]
+
+    def encode(self, position, path):
+        payload = json.dumps(position, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        return "%s.%s" % (b64encode(payload), b64encode(self.get_mac(payload, path)))
+
+    def decode(self, cursor, path):
+        try:
+            payload, mac = cursor.split(".")
+            payload = b64decode(payload)
+            valid = hmac.compare_digest(b64decode(mac), self.get_mac(payload, path))
+        except (ValueError, TypeError, UnicodeError):
+            valid = False
+        if not valid:
+            raise ValueError("Invalid cursor")
+        return json.loads(payload.decode("utf-8"))
+
+
+# Generated before the workers are forked, so they share it until a restart
+signer = CursorSigner(os.urandom(32))
+generated_secret = signer.secret
+
+
+def configure(config):
+    secret = config.get_pagination_secret()
+    signer.secret = secret.encode("utf-8") if secret else generated_secret
+
+
+def decode_cursor(value):
+    """ The type of the cursor argument, the decoded position """
+    return signer.decode(value, request.path)
+
+
+class KeyedSource(object):
+    """ Data source read from a key onwards, for example a database table
+        fetch: function(after, before, limit) returning at most limit items
+               in the order of their keys. The items are the ones after the
+               key after, or the last ones before the key before, or the
+               first ones when both are None.
+        key: function returning the JSON serializable key of an item
+    """
+    def __init__(self, fetch, key):
+        self.fetch = fetch
+        self.key = key
+
+    def get_page(self, limit, position):
+        position = position or {}
+        if "b" in position:
+            items = self.fetch(None, position["b"], limit + 1)
+            has_prev = len(items) > limit
+            items = items[-limit:]
+            prev_position = {"b": self.key(items[0])} if has_prev and items else None
+            next_position = {"a": self.key(items[-1])} if items else None
+            return items, prev_position, next_position
+        items = self.fetch(position.get("a"), None, limit + 1)
+        has_next = len(items) > limit
+        items = items[:limit]
+        prev_position = {"b": self.key(items[0])} if "a" in position and items else None
+        next_position = {"a": self.key(items[-1])} if has_next else None
+        return items, prev_position, next_position
+
+
+class IterableSource(object):
+    """ Any iterable paged by the offset, the items before the page are
+        skipped on every request
+    """
+    def __init__(self, iterable):
+        self.iterable = iterable
+
+    def get_page(self, limit, position):
+        offset = (position or {}).get("o", 0)
+        items = list(itertools.islice(self.iterable, offset, offset + limit + 1))
+        has_next = len(items) > limit
+        items = items[:limit]
+        prev_position = {"o": max(0, offset - limit)} if offset else None
+        next_position = {"o": offset + limit} if has_next else None
+        return items, prev_position, next_position
+
+
+def get_link(limit, position):
+    if position is None:
+        return None
+    args = request.args.copy()
+    args[LIMIT_ARGUMENT] = limit
+    args[CURSOR_ARGUMENT] = signer.encode(position, request.path)
+    return "%s%s?%s" % (request.host_url, request.path.lstrip("/"), url_encode(args))
+
+
+def paginate(source, limit, position):
+    """ Returns the page of the source at the position
+        source: KeyedSource or any other iterable
+        Returns: {"items": [...], "links": {"prev": url, "next": url}}, the
+                 links are None at the ends
+    """
+    if not isinstance(source, KeyedSource):
+        source = IterableSource(source)
+    items, prev_position, next_position = source.get_page(limit, position)
+    return {"items": items,
+            "links": {"prev": get_link(limit, prev_position), "next": get_link(limit, next_position)}}
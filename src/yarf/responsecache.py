@@ -0,0 +1,160 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import Response
+
+# Headers that are not replayed from the cache, the framework sets them
+# again for every response
+SKIPPED_HEADERS = ("content-length", "server", "set-cookie", "etag")
+
+
+class CachedResponse(object):
+    __slots__ = ("resource", "subarea", "path", "expires", "etag", "status", "headers", "body", "size")
+
+    def __init__(self, resource, path, ttl, response):
+        self.resource = resource
+        self.subarea = resource.subarea
+        self.path = path
+        self.expires = time.time() + ttl
+        self.body = response.get_data()
+        self.etag = response.get_etag()[0] or hashlib.sha1(self.body).hexdigest()
+        self.status = response.status_code
+        self.headers = [(name, value) for name, value in response.headers
+                        if name.lower() not in SKIPPED_HEADERS]
+        self.size = len(self.body) + sum(len(name) + len(value) for name, value in self.headers)
+
+    def make_response(self):
+        response = Response(self.body, self.status, self.headers)
+        response.set_etag(self.etag)
+        return response
+
+
+class ResponseCache(object):
+    """ Bounded LRU cache of the serialized GET responses of the resources
+        that set cache_ttl
+        Parameters:
+            max_bytes: Maximum size of the cached responses, 0 disables
+                       the cache
+    """
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.size = 0
+        self.stats = {}
+
+    @staticmethod
+    def get_key(resource, req, user):
+        """ The path, and so the API version, and the Accept header are
+            always part of the key, the query arguments and the user as the
+            resource declares
+        """
+        if resource.cache_vary_args is None:
+            args = tuple(sorted(req.args.items(multi=True)))
+        else:
+            args = tuple((name, tuple(req.args.getlist(name))) for name in resource.cache_vary_args)
+        if not resource.cache_per_user:
+            user = None
+        return (resource, req.path, args, req.headers.get("Accept", ""), user)
+
+    def _get_stats(self, subarea):
+        stats = self.stats.get(subarea)
+        if stats is None:
+            stats = self.stats[subarea] = {"hits": 0, "misses": 0, "not_modified": 0, "entries": 0, "bytes": 0}
+        return stats
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+        stats = self._get_stats(entry.subarea)
+        stats["entries"] -= 1
+        stats["bytes"] -= entry.size
+        return entry
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires <= now:
+                self._remove(key)
+                entry = None
+            stats = self._get_stats(key[0].subarea)
+            if entry is None:
+                stats["misses"] += 1
+                return None
+            self.entries[key] = self.entries.pop(key)
+            stats["hits"] += 1
+            return entry
+
+    def count_not_modified(self, resource):
+        with self.lock:
+            self._get_stats(resource.subarea)["not_modified"] += 1
+
+    def set(self, key, ttl, response):
+        """ Stores the response and returns its ETag
+        """
+        entry = CachedResponse(key[0], key[1], ttl, response)
+        if entry.size > self.max_bytes:
+            return entry.etag
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = entry
+            self.size += entry.size
+            stats = self._get_stats(entry.subarea)
+            stats["entries"] += 1
+            stats["bytes"] += entry.size
+            self._trim()
+        return entry.etag
+
+    def _trim(self):
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def invalidate(self, resource=None, subarea=None, path=None):
+        """ Removes the responses matching all the given conditions
+            resource: the resource class
+            subarea: the subarea of the resources
+            path: the path of the request without the query
+        """
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                if resource is not None and entry.resource is not resource:
+                    continue
+                if subarea is not None and entry.subarea != subarea:
+                    continue
+                if path is not None and entry.path != path:
+                    continue
+                self._remove(key)
+
+    def resize(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._trim()
+
+    def get_stats(self, stat):
+        with self.lock:
+            return dict(((subarea,), stats[stat]) for subarea, stats in self.stats.items())
+
+
+response_cache = ResponseCache()
+
+
+def configure(config):
+    response_cache.resize(config.get_response_cache_max_bytes())
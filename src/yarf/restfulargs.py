@@ -15,9 +15,13 @@
 
 import argparse
 import sys
+import six
 
+import yarf.admission as admission
+import yarf.compression as compression
 import yarf.config_defaults as config_defaults
 import yarf.restfullogger as restfullogger
+import yarf.serializers as serializers
 
 from yarf.iniloader import INILoader
 from yarf.exceptions import ConfigError
@@ -26,11 +30,9 @@ from yarf.exceptions import ConfigError
 def exception_handler(func):
     def exception_wrapper(*args, **kwargs):
         try:
-            restlogger = restfullogger.get_logger()
-            restlogger.debug("calling {}".format(func.__name__))
-            ret = func(*args, **kwargs)
-            return ret
+            return func(*args, **kwargs)
         except Exception as error:
+            restlogger = restfullogger.get_logger()
             restlogger.info("Exception from function {} (error: {})".format(func.__name__, str(error)))
             if isinstance(error, ConfigError):
                 raise error
@@ -39,6 +41,108 @@ def exception_handler(func):
     return exception_wrapper
 
 
+# Options that are applied only when the server is restarted
+RESTART_OPTIONS = ("port", "ip_address", "use_ssl", "ssl_private_key", "ssl_certificate", "handler_directory",
+                   "threaded", "passthrough_errors", "server", "workers", "worker_threads", "backlog",
+                   "max_requests", "max_requests_jitter", "graceful_timeout", "worker_connections",
+                   "max_concurrency", "queue_size", "queue_timeout", "retry_after", "subarea_concurrency",
+                   "enable_metrics", "log_mode", "log_queue_size", "plugin_cache_file",
+                   "plugin_init_threads", "plugin_background_init", "plugin_prewarm",
+                   "enable_msgpack")
+
+
+def to_bool(value):
+    try:
+        return INILoader.BOOLEAN_STATES[value.lower()]
+    except KeyError:
+        raise ConfigError("Not a boolean: %s" % value)
+
+
+def to_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class FrozenConfig(object):
+    """ Immutable set of configuration values
+        The subclasses list their options as (name, conversion function)
+        pairs in options and the same names in __slots__.
+    """
+    __slots__ = ()
+    options = ()
+
+    def __init__(self, values):
+        for name, convert in self.options:
+            value = values.get(name)
+            if value is not None:
+                try:
+                    value = convert(value)
+                except ValueError as error:
+                    raise ConfigError("Invalid value for %s: %s" % (name, error))
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Configuration is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError("Configuration is read only")
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name, _ in self.options)
+
+    def get_changes(self, other):
+        return [name for name, _ in self.options if getattr(self, name) != getattr(other, name)]
+
+
+class KeystoneConfig(FrozenConfig):
+    options = (("user", six.text_type), ("password", six.text_type), ("auth_uri", six.text_type),
+               ("token_cache_size", int), ("token_cache_ttl", int), ("token_cache_negative_ttl", int),
+               ("token_revocation_ttl", int), ("validation_timeout", float), ("token_key_repository", six.text_type),
+               ("pool_size", int), ("keep_alive", to_bool), ("connect_timeout", float), ("read_timeout", float),
+               ("retries", int), ("retry_backoff", float),
+               ("breaker_failure_threshold", int), ("breaker_reset_timeout", float))
+    __slots__ = tuple(name for name, _ in options)
+
+
+class ConfigSnapshot(FrozenConfig):
+    """ The [restframe] options and the [keystone] section parsed once
+    """
+    options = (("port", int), ("ip_address", six.text_type), ("debug", to_bool),
+               ("use_ssl", to_bool), ("ssl_private_key", six.text_type), ("ssl_certificate", six.text_type),
+               ("auth_method", six.text_type), ("handler_directory", six.text_type),
+               ("threaded", to_bool), ("passthrough_errors", to_bool),
+               ("server", six.text_type), ("workers", int), ("worker_threads", int), ("backlog", int),
+               ("max_requests", int), ("max_requests_jitter", int), ("graceful_timeout", int),
+               ("worker_connections", int),
+               ("max_concurrency", int), ("queue_size", int), ("queue_timeout", float), ("retry_after", int),
+               ("subarea_concurrency", admission.parse_subarea_limits),
+               ("enable_metrics", to_bool), ("log_mode", six.text_type), ("log_queue_size", int),
+               ("log_response_body", to_bool), ("log_response_body_sample_rate", float),
+               ("log_response_body_max_bytes", int), ("secrets", to_list),
+               ("plugin_drain_timeout", float), ("plugin_scan_threads", int),
+               ("plugin_cache_file", six.text_type), ("plugin_init_threads", int),
+               ("plugin_background_init", to_bool), ("plugin_lazy_load", to_bool),
+               ("plugin_prewarm", to_list), ("json_backend", serializers.to_json_backend), ("json_pretty", to_bool),
+               ("enable_msgpack", to_bool), ("compression", compression.to_encodings),
+               ("compression_min_size", int), ("compression_level", compression.to_level), ("response_cache_max_bytes", int),
+               ("pagination_secret", six.text_type))
+    __slots__ = tuple(name for name, _ in options) + ("keystone",)
+
+    def __init__(self, values, keystone):
+        super(ConfigSnapshot, self).__init__(values)
+        object.__setattr__(self, "keystone", keystone)
+
+    def get_changes(self, other):
+        changes = super(ConfigSnapshot, self).get_changes(other)
+        changes.extend("keystone.%s" % name for name in self.keystone.get_changes(other.keystone))
+        return changes
+
+    @classmethod
+    def from_loader(cls, loader, section):
+        keystone = dict(config_defaults.keystone_defaults)
+        keystone.update(loader.get_section("keystone", format='dict') or {})
+        return cls(loader.get_section(section, format='dict') or {}, KeystoneConfig(keystone))
+
+
 class RestConfig(object):
     __restinstance = None
 
@@ -48,12 +152,16 @@ class RestConfig(object):
         return RestConfig.__restinstance
 
     def __init__(self):
+        # The instance is shared, do not lose the parsed configuration
+        if getattr(self, "snapshot", None) is not None:
+            return
         self.default_section = config_defaults.default_section
         self.config_default = config_defaults.config_defaults
         self.default_config_file = config_defaults.default_config_file
 
         self.config = None
         self.config_file = None
+        self.snapshot = None
 
     @exception_handler
     def parse(self, args=sys.argv[1:]):
@@ -66,54 +174,232 @@ class RestConfig(object):
 
         args = parser.parse_args(args)
         self.config_file = args.config_file
-        self.config = INILoader(self.config_file, defaults=self.config_default, defaultsection=self.default_section)
+        self.config = self._load()
+        self.snapshot = ConfigSnapshot.from_loader(self.config, self.default_section)
+
+    def _load(self):
+        config = INILoader(self.config_file, defaults=self.config_default, defaultsection=self.default_section)
+        if self.default_section not in config.get_sections():
+            raise ConfigError("No %s section in %s" % (self.default_section, self.config_file))
+        return config
+
+    @exception_handler
+    def reload(self):
+        """ Reads the configuration file again and replaces the snapshot
+            All the options are checked before the snapshot is replaced, an
+            invalid file keeps the old configuration in use.
+            Returns: tuple of the changed options and of the changed options
+                     that need a restart
+        """
+        config = self._load()
+        snapshot = ConfigSnapshot.from_loader(config, self.default_section)
+        changes = snapshot.get_changes(self.snapshot)
+        self.config = config
+        self.snapshot = snapshot
+        return changes, [name for name in changes if name in RESTART_OPTIONS]
+
+    def get_state(self):
+        return self.config, self.snapshot
+
+    def restore(self, state):
+        """ Puts back the configuration returned by get_state """
+        self.config, self.snapshot = state
+
+    def get_snapshot(self):
+        if self.snapshot is None:
+            self.parse()
+        return self.snapshot
 
     @exception_handler
     def get_port(self):
-        return self.config.get('port', type_of_value=int)
+        return self.snapshot.port
 
     @exception_handler
     def get_ip(self):
-        return self.config.get('ip_address')
+        return self.snapshot.ip_address
 
     @exception_handler
     def use_ssl(self):
-        return self.config.get('use_ssl', type_of_value=bool)
+        return self.snapshot.use_ssl
 
     @exception_handler
     def get_private_key(self):
-        if self.use_ssl():
-            return self.config.get('ssl_private_key')
+        if self.snapshot.use_ssl:
+            return self.snapshot.ssl_private_key
         return None
 
     @exception_handler
     def get_certificate(self):
-        if self.use_ssl():
-            return self.config.get('ssl_certificate')
+        if self.snapshot.use_ssl:
+            return self.snapshot.ssl_certificate
         return None
 
     @exception_handler
     def get_handler_dir(self):
-        return self.config.get('handler_directory')
+        return self.snapshot.handler_directory
 
     def get_section(self, section, format='list'):
         return self.config.get_section(section, format=format)
 
     def get_debug(self):
-        return self.config.get('debug', type_of_value=bool)
+        return self.snapshot.debug
 
     @exception_handler
     def get_passthrough_errors(self):
-        return self.config.get('passthrough_errors', type_of_value=bool)
+        return self.snapshot.passthrough_errors
 
     @exception_handler
     def is_threaded(self):
-        return self.config.get('threaded', type_of_value=bool)
+        return self.snapshot.threaded
 
     @exception_handler
     def get_auth_method(self):
-        return self.config.get('auth_method')
+        return self.snapshot.auth_method
+
+    @exception_handler
+    def get_server(self):
+        return self.snapshot.server
+
+    @exception_handler
+    def get_workers(self):
+        return self.snapshot.workers
+
+    @exception_handler
+    def get_worker_threads(self):
+        return self.snapshot.worker_threads
+
+    @exception_handler
+    def get_backlog(self):
+        return self.snapshot.backlog
+
+    @exception_handler
+    def get_max_requests(self):
+        return self.snapshot.max_requests
+
+    @exception_handler
+    def get_max_requests_jitter(self):
+        return self.snapshot.max_requests_jitter
+
+    @exception_handler
+    def get_graceful_timeout(self):
+        return self.snapshot.graceful_timeout
+
+    @exception_handler
+    def get_worker_connections(self):
+        return self.snapshot.worker_connections
+
+    @exception_handler
+    def get_max_concurrency(self):
+        return self.snapshot.max_concurrency
+
+    @exception_handler
+    def get_queue_size(self):
+        return self.snapshot.queue_size
+
+    @exception_handler
+    def get_queue_timeout(self):
+        return self.snapshot.queue_timeout
+
+    @exception_handler
+    def get_retry_after(self):
+        return self.snapshot.retry_after
+
+    @exception_handler
+    def get_log_mode(self):
+        return self.snapshot.log_mode
+
+    @exception_handler
+    def get_log_queue_size(self):
+        return self.snapshot.log_queue_size
+
+    @exception_handler
+    def get_log_response_body(self):
+        return self.snapshot.log_response_body
+
+    @exception_handler
+    def get_log_response_body_sample_rate(self):
+        return self.snapshot.log_response_body_sample_rate
+
+    @exception_handler
+    def get_log_response_body_max_bytes(self):
+        return self.snapshot.log_response_body_max_bytes
+
+    @exception_handler
+    def get_secrets(self):
+        return self.snapshot.secrets
+
+    @exception_handler
+    def get_plugin_drain_timeout(self):
+        return self.snapshot.plugin_drain_timeout
+
+    @exception_handler
+    def get_plugin_scan_threads(self):
+        return self.snapshot.plugin_scan_threads
+
+    @exception_handler
+    def get_plugin_cache_file(self):
+        return self.snapshot.plugin_cache_file
+
+    @exception_handler
+    def get_plugin_init_threads(self):
+        return self.snapshot.plugin_init_threads
+
+    @exception_handler
+    def get_plugin_background_init(self):
+        return self.snapshot.plugin_background_init
+
+    @exception_handler
+    def get_plugin_lazy_load(self):
+        return self.snapshot.plugin_lazy_load
+
+    @exception_handler
+    def get_plugin_prewarm(self):
+        return self.snapshot.plugin_prewarm
+
+    @exception_handler
+    def get_json_backend(self):
+        return self.snapshot.json_backend
+
+    @exception_handler
+    def get_json_pretty(self):
+        return self.snapshot.json_pretty
+
+    @exception_handler
+    def get_enable_msgpack(self):
+        return self.snapshot.enable_msgpack
+
+    @exception_handler
+    def get_compression(self):
+        return self.snapshot.compression
+
+    @exception_handler
+    def get_compression_min_size(self):
+        return self.snapshot.compression_min_size
+
+    @exception_handler
+    def get_compression_level(self):
+        return self.snapshot.compression_level
+
+    @exception_handler
+    def get_response_cache_max_bytes(self):
+        return self.snapshot.response_cache_max_bytes
+
+    @exception_handler
+    def get_pagination_secret(self):
+        return self.snapshot.pagination_secret
+
+    @exception_handler
+    def get_enable_metrics(self):
+        return self.snapshot.enable_metrics
+
+    @exception_handler
+    def get_subarea_concurrency(self):
+        return self.snapshot.subarea_concurrency
 
 
 def get_config():
     return RestConfig()
+
+
+def get_snapshot():
+    return RestConfig().get_snapshot()
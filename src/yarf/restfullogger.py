@@ -13,11 +13,83 @@
 # limitations under the License.
 #
 
+import os
 import logging
 import logging.handlers
+import threading
+from six.moves import queue
 restlogger = None
 
 
+class QueuedHandler(logging.Handler):
+    """ Handler passing the records to the target handler in a background thread
+        The request threads only put the record to a bounded queue. When the
+        queue is full the record is dropped and counted instead of blocking
+        the request.
+    """
+    def __init__(self, target, maxsize):
+        super(QueuedHandler, self).__init__()
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.queue = None
+        self.writer = None
+        self.pid = None
+        self.writer_lock = threading.Lock()
+
+    def _start_writer(self):
+        # The writer thread does not survive fork so every process starts its own
+        with self.writer_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self.writer = threading.Thread(target=self._write, args=(self.queue,), name="restfullogger")
+            self.writer.daemon = True
+            self.writer.start()
+            self.pid = os.getpid()
+
+    def _write(self, records):
+        while True:
+            record = records.get()
+            if record is None:
+                break
+            try:
+                self.target.handle(record)
+            except Exception: # pylint: disable=broad-except
+                self.target.handleError(record)
+
+    def prepare(self, record):
+        # Format the message in the calling thread so the arguments are not
+        # accessed after the request has ended
+        if record.exc_info:
+            formatter = self.target.formatter or logging.Formatter()
+            record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        if self.pid != os.getpid():
+            self._start_writer()
+        try:
+            self.queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception: # pylint: disable=broad-except
+            self.handleError(record)
+
+    def close(self):
+        if self.pid == os.getpid():
+            try:
+                self.queue.put(None, timeout=1)
+            except queue.Full:
+                pass
+            self.writer.join(1)
+        self.target.close()
+        super(QueuedHandler, self).close()
+
+
 class RestfulLogger(object):
     def __init__(self):
         self.logger = logging.getLogger("Restfulserver")
@@ -48,6 +120,17 @@ class RestfulLogger(object):
         for handler in self.handlers:
             self.logger.addHandler(handler)
 
+    def use_queue(self, maxsize):
+        if isinstance(self.sysloghandler, QueuedHandler):
+            return
+        self.logger.removeHandler(self.sysloghandler)
+        self.sysloghandler = QueuedHandler(self.sysloghandler, maxsize)
+        self.handlers = [self.sysloghandler]
+        self._add_handlers()
+
+    def get_dropped_records(self):
+        return getattr(self.sysloghandler, "dropped", 0)
+
     def get_handlers(self):
         return self.handlers
 
@@ -65,3 +148,15 @@ def get_log_handlers():
     if not restlogger:
         restlogger = RestfulLogger()
     return restlogger.get_handlers()
+
+def configure(config):
+    global restlogger
+    if not restlogger:
+        restlogger = RestfulLogger()
+    if config.get_log_mode() == "queue":
+        restlogger.use_queue(config.get_log_queue_size())
+
+def get_dropped_records():
+    if not restlogger:
+        return 0
+    return restlogger.get_dropped_records()
@@ -13,13 +13,17 @@
 # limitations under the License.
 #
 
+import decimal
 import inspect
 import six
 from flask import request
-from flask_restful import reqparse
+from flask_restful import abort, reqparse
+from werkzeug.datastructures import MultiDict
 from werkzeug.exceptions import BadRequest
 
 from yarf.baseresource import BaseResource
+from yarf.responsecache import response_cache
+import yarf.pagination as pagination
 
 class RequestArgument(object):
     """ More advanced arguments
@@ -51,6 +55,126 @@ class RequestArgument(object):
         if not status:
             raise BadRequest(description=reason)
 
+MISSING_ARGUMENT = u"Missing required parameter in the JSON body or the post body or the query string"
+
+
+def get_arity(func):
+    """ Amount of arguments reqparse would give to the type function:
+        3 (value, name, operator), 2 (value, name), 1 (value) or None when
+        it has to be found out by trying like reqparse does
+    """
+    if func in (int, float, bool, str, six.text_type):
+        return 1
+    if inspect.isfunction(func) or inspect.ismethod(func):
+        spec_func, skip = func, 1 if inspect.ismethod(func) and func.__self__ is not None else 0
+    elif not inspect.isclass(func) and inspect.ismethod(getattr(func, "__call__", None)):
+        spec_func, skip = func.__call__, 1
+    else:
+        return None
+    try:
+        spec = inspect.getargspec(spec_func)
+    except TypeError:
+        return None
+    if spec.varargs:
+        return 3
+    return min(max(len(spec.args) - skip, 1), 3)
+
+
+class ArgumentSchema(object):
+    """ The parser arguments of a resource prepared for parsing
+        The arguments using only the options supported here are parsed by
+        reading the JSON body and the query and form values once, the others
+        with reqparse. All the invalid arguments are reported in one 400
+        response.
+    """
+    def __init__(self, parser, parser_arguments, argument_class):
+        self.validators = {}
+        for argument in parser_arguments:
+            if isinstance(argument, argument_class) and argument.validate_func:
+                self.validators[argument.name] = argument.validate_func
+        self.fields = []
+        self.compiled = all(self.is_supported(argument) for argument in parser.args)
+        if self.compiled:
+            for argument in parser.args:
+                self.fields.append((argument.name, argument.dest or argument.name, argument,
+                                    self.get_converter(argument)))
+
+    @staticmethod
+    def is_supported(argument):
+        return (tuple(argument.location) == ("json", "values") and argument.action == "store" and
+                tuple(argument.operators) == ("=",) and argument.case_sensitive and not argument.ignore)
+
+    @staticmethod
+    def get_converter(argument):
+        type_func = argument.type
+        if type_func is decimal.Decimal:
+            return lambda value: type_func(str(value))
+        arity = get_arity(type_func)
+        if arity == 1:
+            return type_func
+        elif arity == 2:
+            return lambda value: type_func(value, argument.name)
+        elif arity == 3:
+            return lambda value: type_func(value, argument.name, "=")
+        return lambda value: argument.convert(value, "=")
+
+    @staticmethod
+    def get_source(req):
+        source = MultiDict()
+        for location in ("json", "values"):
+            value = getattr(req, location, None)
+            if value is not None:
+                source.update(value)
+        return source
+
+    @staticmethod
+    def get_error(argument, error):
+        error_str = six.text_type(error)
+        return argument.help.format(error_msg=error_str) if argument.help else error_str
+
+    def parse(self, req):
+        source = self.get_source(req)
+        args = reqparse.Namespace()
+        errors = {}
+        for name, dest, argument, convert in self.fields:
+            if name not in source:
+                if argument.required:
+                    errors[name] = self.get_error(argument, MISSING_ARGUMENT)
+                elif argument.store_missing:
+                    args[dest] = argument.default() if callable(argument.default) else argument.default
+                continue
+            results = []
+            for value in source.getlist(name):
+                if argument.trim and hasattr(value, "strip"):
+                    value = value.strip()
+                try:
+                    if value is None:
+                        if not argument.nullable:
+                            raise ValueError("Must not be null!")
+                    else:
+                        value = convert(value)
+                except Exception as error: # pylint: disable=broad-except
+                    errors[name] = self.get_error(argument, error)
+                    break
+                if argument.choices and value not in argument.choices:
+                    errors[name] = self.get_error(argument, u"{0} is not a valid choice".format(value))
+                    break
+                results.append(value)
+            else:
+                args[dest] = results[0]
+        return args, errors
+
+    def validate(self, args, errors):
+        for name, validate_func in self.validators.items():
+            if name in errors or name not in args:
+                continue
+            status, reason = validate_func(args[name])
+            if not status:
+                errors[name] = reason
+        if errors:
+            abort(400, message=errors)
+
+
 class RestResource(BaseResource):
     """ Class from which the plugins should inherit
         Variables:
@@ -62,11 +186,39 @@ class RestResource(BaseResource):
                           if you need arguments for your plugin
                           these arguments can be fetched with
                           get_args
+        log_response_body: True or False to enable or disable
+                           logging of the response bodies in debug
+                           level, None follows the configuration
+        secret_arguments: Names of the arguments whose values are
+                          hidden from the logs
+        compress: False to send the responses uncompressed even
+                  when the client accepts a compression
+        cache_ttl: Seconds the responses of get are served from the
+                   response cache without calling get or the
+                   extra_wrappers, 0 disables the caching
+        cache_vary_args: Names of the query arguments the responses
+                         depend on, None means all of them
+        cache_per_user: False to share the cached responses between
+                        the users
+        paginated: True to add the limit and cursor arguments for
+                   paginate
+        page_size: The limit when the request does not give it
+        max_page_size: The largest limit a request can give
     """
     extra_wrappers = []
     parser_arguments = []
+    log_response_body = None
+    secret_arguments = []
+    compress = True
+    cache_ttl = 0
+    cache_vary_args = None
+    cache_per_user = True
+    paginated = False
+    page_size = 100
+    max_page_size = 1000
     endpoints = None
     int_arg_class = RequestArgument
+    argument_schema = None
 
     """ Function to get arguments from request
         The function will call validate to the
@@ -75,13 +227,21 @@ class RestResource(BaseResource):
     """
     @classmethod
     def get_args(cls):
-        args = cls.parser.parse_args()
-        for arg in args.keys():
-            for parg in cls.parser_arguments:
-                if isinstance(parg, cls.int_arg_class) and parg.name == arg:
-                    parg.validate(args[arg])
+        schema = cls.argument_schema
+        if schema.compiled:
+            args, errors = schema.parse(request)
+        else:
+            args, errors = cls.parser.parse_args(), {}
+        schema.validate(args, errors)
         return args
 
+    @classmethod
+    def add_parser_arguments(cls):
+        if cls.paginated:
+            cls.add_pagination_arguments()
+        super(RestResource, cls).add_parser_arguments()
+        cls.argument_schema = ArgumentSchema(cls.parser, cls.parser_arguments, cls.int_arg_class)
+
     @classmethod
     def get_token(cls):
         token = ""
@@ -91,3 +251,38 @@ class RestResource(BaseResource):
             cls.logger.info("Failed to get auth token from request.")
         return token
 
+    @classmethod
+    def invalidate_cache(cls, path=None):
+        """ Removes the cached responses of the resource, for example after
+            a change in post, put or delete
+            path: remove only the responses of this path
+        """
+        response_cache.invalidate(resource=cls, path=path)
+
+    @classmethod
+    def add_pagination_arguments(cls):
+        max_page_size = cls.max_page_size
+
+        def validate_limit(value):
+            if 1 <= value <= max_page_size:
+                return True, ""
+            return False, "limit has to be from 1 to %d" % max_page_size
+
+        arguments = [RequestArgument(pagination.LIMIT_ARGUMENT, default=cls.page_size, validate=validate_limit,
+                                     typeof=int),
+                     RequestArgument(pagination.CURSOR_ARGUMENT, typeof=pagination.decode_cursor)]
+        names = [getattr(argument, "name", argument) for argument in cls.parser_arguments]
+        cls.parser_arguments = list(cls.parser_arguments) + [argument for argument in arguments
+                                                             if argument.name not in names]
+        if cls.cache_vary_args is not None:
+            cls.cache_vary_args = list(cls.cache_vary_args) + [argument.name for argument in arguments
+                                                               if argument.name not in cls.cache_vary_args]
+
+    @classmethod
+    def paginate(cls, source, args):
+        """ Returns the page of the source selected by the limit and the
+            cursor of the arguments got with get_args
+            source: any iterable, paged by the offset, or a KeyedSource
+            Returns: {"items": [...], "links": {"prev": url, "next": url}}
+        """
+        return pagination.paginate(source, args[pagination.LIMIT_ARGUMENT], args[pagination.CURSOR_ARGUMENT])
@@ -0,0 +1,199 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+from collections import OrderedDict
+import six
+from flask import Response, has_request_context, make_response, stream_with_context
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from yarf.exceptions import ConfigError
+import yarf.restfullogger as restlog
+
+JSON_MEDIATYPE = "application/json"
+NDJSON_MEDIATYPE = "application/x-ndjson"
+MSGPACK_MEDIATYPES = ("application/x-msgpack", "application/msgpack")
+
+
+class RawJSON(object):
+    """ JSON serialized already by a plugin
+        The data is written to the response as it is:
+            return RawJSON(cached_json), 200
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class JSONSerializer(object):
+    """ Serializes the responses with the configured JSON module
+        backend: auto (same as json), json, simplejson or ujson. The json
+                 module of CPython uses its C encoder only for compact
+                 output, it is faster than simplejson. ujson is never chosen
+                 automatically as it rounds the floats.
+        pretty: indent and sort the keys, otherwise the output is compact
+    """
+    def __init__(self, backend="auto", pretty=False):
+        self.backend = self.get_backend(backend)
+        self.pretty = pretty
+        if self.backend is ujson:
+            self.kwargs = {"escape_forward_slashes": False}
+            if pretty:
+                self.kwargs["indent"] = 4
+        elif pretty:
+            self.kwargs = {"indent": 4, "sort_keys": True}
+        else:
+            self.kwargs = {"separators": (",", ":")}
+
+    @staticmethod
+    def get_backend(backend):
+        if backend == "auto":
+            return json
+        modules = {"json": json, "simplejson": simplejson, "ujson": ujson}
+        if backend not in modules:
+            raise ConfigError("Unknown json_backend %s" % backend)
+        if modules[backend] is None:
+            raise ConfigError("json_backend %s is not installed" % backend)
+        return modules[backend]
+
+    def encode(self, data):
+        if isinstance(data, RawJSON):
+            return data.data
+        return self.backend.dumps(data, **self.kwargs)
+
+    def dumps(self, data):
+        if isinstance(data, RawJSON):
+            return data.data
+        return self.encode(data) + "\n"
+
+    def loads(self, data):
+        return self.backend.loads(data)
+
+
+json_serializer = JSONSerializer()
+
+
+def to_json_backend(value):
+    """ The json_backend option, checked when the configuration is parsed """
+    JSONSerializer.get_backend(value)
+    return value
+
+
+class JSONStream(Response):
+    """ Streams the items of an iterable as JSON
+        The items are serialized one by one while the response is sent and
+        the next ones are read only when the server is ready to send them,
+        so the whole result is never held in memory:
+            return JSONStream(inventory.iter_hosts())
+        layout: envelope sends the items as the data of
+                {"code": code, "description": description, "data": [...]},
+                array only the list and ndjson one item per line
+        chunk_size: the items are written in chunks of about this many bytes
+        The status cannot be changed after the first chunk is sent. If the
+        iterable raises an error, the error is logged and the response is
+        cut so that the client fails to parse it.
+    """
+    LAYOUTS = ("envelope", "array", "ndjson")
+
+    def __init__(self, items, status=200, headers=None, layout="envelope", code=0, description="",
+                 chunk_size=8192):
+        if layout not in self.LAYOUTS:
+            raise ValueError("Unknown layout %s" % layout)
+        mimetype = NDJSON_MEDIATYPE if layout == "ndjson" else JSON_MEDIATYPE
+        chunks = self.generate(items, layout, code, description, chunk_size, json_serializer)
+        if has_request_context():
+            # The items can use the request and g while they are sent
+            chunks = stream_with_context(chunks)
+        super(JSONStream, self).__init__(chunks, status, headers, mimetype=mimetype)
+
+    @staticmethod
+    def generate(items, layout, code, description, chunk_size, serializer):
+        if layout == "envelope":
+            head = '{"code":%s,"description":%s,"data":[' % (serializer.encode(code), serializer.encode(description))
+            separator, end, tail = ",", "", "]}\n"
+        elif layout == "array":
+            head, separator, end, tail = "[", ",", "", "]\n"
+        else:
+            head, separator, end, tail = "", "", "\n", ""
+        chunk = [head]
+        size = len(head)
+        first = True
+        try:
+            for item in items:
+                if not first:
+                    chunk.append(separator)
+                first = False
+                data = serializer.encode(item) + end
+                chunk.append(data)
+                size += len(data)
+                if size >= chunk_size:
+                    yield "".join(chunk)
+                    chunk = []
+                    size = 0
+        except Exception: # pylint: disable=broad-except
+            restlog.get_logger().exception("Streaming the response failed, cutting it")
+            return
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+        chunk.append(tail)
+        yield "".join(chunk)
+
+
+def configure(config):
+    global json_serializer
+    json_serializer = JSONSerializer(config.get_json_backend(), config.get_json_pretty())
+
+
+def output_json(data, code, headers=None):
+    resp = make_response(json_serializer.dumps(data), code)
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def output_msgpack(data, code, headers=None):
+    if isinstance(data, RawJSON):
+        data = json_serializer.loads(data.data)
+    # The str of python 2 is text in the responses, not binary
+    resp = make_response(msgpack.packb(data, use_bin_type=not six.PY2), code)
+    resp.headers.extend(headers or {})
+    return resp
+
+
+def get_representations(config):
+    """ The representations for the Api by media type, JSON is the default
+        when the client accepts anything
+    """
+    representations = OrderedDict([(JSON_MEDIATYPE, output_json)])
+    if config.get_enable_msgpack() and msgpack is not None:
+        for mediatype in MSGPACK_MEDIATYPES:
+            representations[mediatype] = output_msgpack
+    return representations
@@ -0,0 +1,114 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+try:
+    import gevent.monkey
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+except ImportError:
+    WSGIServer = None
+
+import yarf.restfullogger as restlog
+from yarf.exceptions import ConfigError
+
+
+def get_prefork_options(config):
+    options = {"bind": "%s:%d" % (config.get_ip(), config.get_port()),
+               "workers": config.get_workers(),
+               "threads": config.get_worker_threads(),
+               "backlog": config.get_backlog(),
+               "max_requests": config.get_max_requests(),
+               "max_requests_jitter": config.get_max_requests_jitter(),
+               "graceful_timeout": config.get_graceful_timeout(),
+               "preload_app": True}
+    options["worker_class"] = "gthread" if options["threads"] > 1 else "sync"
+    if config.use_ssl():
+        options["keyfile"] = config.get_private_key()
+        options["certfile"] = config.get_certificate()
+    return options
+
+
+def run_prefork(application, config, on_reload=None):
+    """ Serves the already initialized application with pre-forked workers
+        The plugins are loaded in the master so the workers inherit them.
+        SIGHUP calls on_reload in the master, then starts new workers and
+        stops the old ones gracefully.
+    """
+    if BaseApplication is None:
+        raise ConfigError("Prefork server needs the gunicorn module")
+
+    class PreforkServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super(PreforkServer, self).__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = get_prefork_options(config)
+    if on_reload is not None:
+        options["on_reload"] = lambda arbiter: on_reload()
+    restlog.get_logger().info("Starting prefork server with %d workers", options["workers"])
+    PreforkServer(application, options).run()
+    return 0
+
+
+def is_gevent_patched():
+    return WSGIServer is not None and gevent.monkey.is_module_patched("socket") \
+        and gevent.monkey.is_module_patched("thread")
+
+
+def exec_gevent():
+    """ Starts the server again with the gevent entry point
+        The logger socket and the locks of the modules already imported
+        were created before the standard library could be patched, a
+        blocking syslog or a held lock would stop every greenlet. The new
+        program patches gevent before importing anything else.
+    """
+    if WSGIServer is None:
+        raise ConfigError("Gevent server needs the gevent module")
+    restlog.get_logger().info("Starting again with the gevent entry point")
+    os.execv(sys.executable, [sys.executable, "-m", "yarf.geventapp"] + sys.argv[1:])
+
+
+def run_gevent(application, config):
+    """ Serves the application with greenlets in a single process
+        Every request runs in its own greenlet so the requests waiting for
+        other services do not need a thread each. At most worker_connections
+        requests are served concurrently.
+    """
+    if WSGIServer is None:
+        raise ConfigError("Gevent server needs the gevent module")
+    kwargs = {"spawn": Pool(config.get_worker_connections()),
+              "backlog": config.get_backlog()}
+    if config.use_ssl():
+        kwargs["keyfile"] = config.get_private_key()
+        kwargs["certfile"] = config.get_certificate()
+    restlog.get_logger().info("Starting gevent server with %d connections", config.get_worker_connections())
+    WSGIServer((config.get_ip(), config.get_port()), application, **kwargs).serve_forever()
+    return 0
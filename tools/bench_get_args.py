@@ -0,0 +1,129 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Compares the request argument parsing of RestResource.get_args with the
+reqparse path used before the arguments were compiled to a schema.
+
+The resource has 30 arguments: 10 integer RequestArguments with a
+validator, 10 string RequestArguments, 5 boolean reqparse.Arguments and
+5 plain names. The outputs of both paths are compared first for valid and
+invalid requests. They differ only in the errors: the compiled path
+reports every failed argument at once as {"message": {"<arg>": "<error>"}}.
+
+    python tools/bench_get_args.py [--calls 2000]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from flask import Flask # pylint: disable=wrong-import-position
+from flask_restful import reqparse, inputs # pylint: disable=wrong-import-position
+from werkzeug.exceptions import HTTPException # pylint: disable=wrong-import-position
+from yarf.restresource import RestResource, RequestArgument # pylint: disable=wrong-import-position
+
+app = Flask(__name__)
+
+
+def positive(value):
+    return (value is None or value >= 0, "must be positive")
+
+
+class ThirtyArguments(RestResource):
+    parser_arguments = ([RequestArgument("i%d" % i, default=0, typeof=int, validate=positive) for i in range(10)] +
+                        [RequestArgument("s%d" % i) for i in range(10)] +
+                        [reqparse.Argument("b%d" % i, type=inputs.boolean, default=False) for i in range(5)] +
+                        ["plain%d" % i for i in range(5)])
+
+
+def get_reqparse_parser(resource):
+    parser = reqparse.RequestParser()
+    for argument in resource.parser_arguments:
+        if isinstance(argument, RequestArgument):
+            parser.add_argument(argument.argument_class)
+        else:
+            parser.add_argument(argument)
+    return parser
+
+
+def get_old_args(resource, parser):
+    """ get_args before the schema: reqparse and a validator loop """
+    args = parser.parse_args()
+    for arg in args.keys():
+        for parg in resource.parser_arguments:
+            if isinstance(parg, resource.int_arg_class) and parg.name == arg:
+                parg.validate(args[arg])
+    return args
+
+
+def call(func, **request):
+    with app.test_request_context("/bench", **request):
+        try:
+            return dict(func())
+        except HTTPException as error:
+            return ("error", error.code, getattr(error, "data", None) or error.description)
+
+
+def time_calls(func, calls, **request):
+    with app.test_request_context("/bench", **request):
+        func()
+        start = time.time()
+        for _ in range(calls):
+            func()
+        return (time.time() - start) / calls
+
+
+CASES = [("query", dict(query_string={"i1": "5", "s3": "x", "b2": "true", "plain1": "p"})),
+         ("json", dict(json={"i2": 7, "s1": "y", "b1": False, "s2": None})),
+         ("json and query", dict(json={"i2": 7}, query_string={"i2": "8"})),
+         ("bad integer", dict(query_string={"i1": "zz"})),
+         ("failed validator", dict(query_string={"i1": "-3"})),
+         ("three errors", dict(query_string={"i1": "zz", "i2": "-1", "b0": "maybe"})),
+         ("bad json", dict(data="{bad", content_type="application/json"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RestResource.get_args")
+    parser.add_argument("--calls", type=int, default=2000)
+    options = parser.parse_args()
+
+    ThirtyArguments.logger = logging.getLogger("bench")
+    ThirtyArguments.add_parser_arguments()
+    old_parser = get_reqparse_parser(ThirtyArguments)
+    old = lambda: get_old_args(ThirtyArguments, old_parser)
+
+    print "compiled schema: %s" % ThirtyArguments.argument_schema.compiled
+    for name, request in CASES:
+        old_result, new_result = call(old, **request), call(ThirtyArguments.get_args, **request)
+        if old_result == new_result:
+            print "%-17s same" % name
+        else:
+            print "%-17s reqparse: %s\n%-17s compiled: %s" % (name, old_result, "", new_result)
+
+    request = dict(query_string=dict([("i%d" % i, str(i)) for i in range(10)] +
+                                     [("s%d" % i, "v") for i in range(10)]))
+    old_time = time_calls(old, options.calls, **request)
+    new_time = time_calls(ThirtyArguments.get_args, options.calls, **request)
+    print "reqparse %.3f ms, compiled %.3f ms per get_args call (%.1fx)" % (
+        old_time * 1e3, new_time * 1e3, old_time / new_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Measures the Keystone authentication against the local fake Keystone of
+fake_keystone.py. Every validation uses a new token, so each one misses
+the token cache and goes to Keystone.
+
+    default-session  the HTTP session keystoneauth1 creates by itself, as
+                     before the [keystone] pool options
+    pooled           pool_size matching the threads, keep-alive
+    no-keep-alive    pool_size matching the threads, keep_alive=false
+    down             Keystone accepts the connections but never answers,
+                     connect/read timeout 1 s, 2 retries, the breaker opens
+                     after 5 failures
+    down-default     the same with the default session, which has no
+                     timeouts, stopped after --down-limit seconds
+
+Every scenario runs in its own process. Needs the keystoneauth1 and
+keystoneclient modules.
+
+    python tools/bench_keystone.py [--threads 32] [--requests 50]
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib2
+
+from werkzeug.datastructures import Headers
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(TOOLS, "..", "src")
+SCENARIOS = ("default-session", "pooled", "no-keep-alive", "down", "down-default")
+DOWN_OPTIONS = {"connect_timeout": "1", "read_timeout": "1", "retries": "2", "retry_backoff": "0.2",
+                "breaker_failure_threshold": "5", "breaker_reset_timeout": "30"}
+
+
+class Request(object):
+    """ The part of the flask request the authentication reads """
+    def __init__(self, token):
+        self.headers = Headers([("X-Auth-Token", token)])
+
+
+def get_free_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def get_connections(port):
+    return json.load(urllib2.urlopen("http://127.0.0.1:%d/connections" % port, timeout=5))["connections"]
+
+
+def run_scenario(scenario, port, threads, requests):
+    """ Runs in the child process, prints the results of the scenario """
+    sys.path.insert(0, SRC)
+    logging.disable(logging.CRITICAL)
+    from yarf.restfulargs import RestConfig
+    from yarf.authentication.keystone import KeystoneAuth
+    from yarf.exceptions import ServiceUnavailable
+
+    options = {"user": "admin", "password": "secret", "auth_uri": "http://127.0.0.1:%d" % port,
+               "pool_size": str(threads)}
+    if scenario == "no-keep-alive":
+        options["keep_alive"] = "false"
+    if scenario == "down":
+        options.update(DOWN_OPTIONS)
+    if scenario in ("default-session", "down-default"):
+        KeystoneAuth._get_http_session = staticmethod(lambda conf: None) # pylint: disable=protected-access
+    config, path = tempfile.mkstemp(suffix=".ini")
+    os.write(config, "[restframe]\nauth_method=keystone.KeystoneAuth\n[keystone]\n" +
+             "".join("%s=%s\n" % item for item in options.items()))
+    os.close(config)
+    try:
+        RestConfig().parse(["--config", path])
+    finally:
+        os.unlink(path)
+    auth = KeystoneAuth()
+
+    tokens = itertools.count()
+    latencies = []
+    results = {"ok": 0, "failed": 0, "503": 0}
+    lock = threading.Lock()
+
+    def validate():
+        for _ in range(requests):
+            request = Request("token-%d" % next(tokens))
+            start = time.time()
+            try:
+                result = "ok" if auth.get_authentication(request)[0] else "failed"
+            except ServiceUnavailable:
+                result = "503"
+            with lock:
+                latencies.append(time.time() - start)
+                results[result] += 1
+
+    down = scenario.startswith("down")
+    connections = 0 if down else get_connections(port)
+    workers = [threading.Thread(target=validate) for _ in range(threads)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    line = "%.0f req/s, p50 %.1f ms, p99 %.1f ms, max %.1f ms, ok %d, failed %d, 503 %d" % (
+        len(latencies) / elapsed, percentile(0.5), percentile(0.99), latencies[-1] * 1000,
+        results["ok"], results["failed"], results["503"])
+    if not down:
+        # The request reading the count is one connection as well
+        line += ", new connections %d" % (get_connections(port) - connections - 1)
+    print line
+
+
+def run_child(scenario, port, options, limit=None):
+    command = [sys.executable, os.path.abspath(__file__), "--child", scenario, "--port", str(port),
+               "--threads", str(options.threads),
+               "--requests", str(options.down_requests if scenario.startswith("down") else options.requests)]
+    child = subprocess.Popen(command, stdout=subprocess.PIPE)
+    if limit is not None:
+        deadline = time.time() + limit
+        while child.poll() is None and time.time() < deadline:
+            time.sleep(0.1)
+        if child.poll() is None:
+            child.kill()
+            child.wait()
+            return "no validation finished in %d s" % limit
+    return child.communicate()[0].strip()
+
+
+def start_keystone(*args):
+    port = get_free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(TOOLS, "fake_keystone.py"),
+                               "--port", str(port)] + list(args))
+    for _ in range(50):
+        try:
+            get_connections(port) if "--hang" not in args else socket.create_connection(("127.0.0.1", port)).close()
+            break
+        except (IOError, socket.error):
+            time.sleep(0.1)
+    return server, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Keystone authentication")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50, help="Validations per thread")
+    parser.add_argument("--down-requests", type=int, default=20, help="Validations per thread while down")
+    parser.add_argument("--delay", default="0.005", help="Response time of the fake Keystone")
+    parser.add_argument("--connect-delay", default="0.02", help="Connection setup time of the fake Keystone")
+    parser.add_argument("--down-limit", type=int, default=30)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        run_scenario(options.child, options.port, options.threads, options.requests)
+        return
+
+    keystone, port = start_keystone("--delay", options.delay, "--connect-delay", options.connect_delay)
+    hanging, hanging_port = start_keystone("--hang")
+    try:
+        print "%d threads, Keystone response %s s, connection setup %s s" % (
+            options.threads, options.delay, options.connect_delay)
+        for scenario in options.scenarios.split(","):
+            if scenario.startswith("down"):
+                limit = options.down_limit if scenario == "down-default" else None
+                result = run_child(scenario, hanging_port, options, limit)
+            else:
+                result = run_child(scenario, port, options)
+            print "  %-16s %s" % (scenario, result)
+    finally:
+        keystone.kill()
+        hanging.kill()
+
+
+if __name__ == "__main__":
+    main()
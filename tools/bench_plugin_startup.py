@@ -0,0 +1,155 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Times the plugin discovery at startup on a synthetic handler directory.
+
+The tree has --plugins plugin directories with --modules modules each. Every
+module defines --constants module level names, the first module of a
+plugin also defines the handler named in the .ini file of the plugin.
+Every measurement runs in a new python process so that no module is
+imported yet, the sources are compiled before the first one.
+
+    import-all       every module of a plugin is imported and searched for
+                     the handlers, as the discovery did before the manifests
+    manifest         the manifests are built from the sources and only the
+                     modules defining the handlers are imported
+    manifest-cached  the same with the manifests read from plugin_cache_file
+
+    python tools/bench_plugin_startup.py [--plugins 300] [--modules 5]
+        [--constants 200] [--runs 3] [--directory DIR]
+
+The logger of the framework writes to /dev/log.
+"""
+
+import argparse
+import compileall
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+MODES = ("import-all", "manifest", "manifest-cached")
+
+AUTH_SOURCE = """from yarf.authentication.base_auth import BaseAuthMethod
+
+
+class BenchAuth(BaseAuthMethod):
+    def get_authentication(self, req):
+        return (True, "admin")
+"""
+
+HANDLER_SOURCE = """
+
+class Handler%d(RestResource):
+    endpoints = ["items"]
+
+    def get(self):
+        return {"code": 0, "description": "", "data": {}}
+"""
+
+
+def create_tree(directory, plugins, modules, constants):
+    """ Writes the handler directory, the authentication module and the
+        configuration file to the directory
+    """
+    handlers = os.path.join(directory, "handlers")
+    os.makedirs(handlers)
+    for plugin in range(plugins):
+        plugin_dir = os.path.join(handlers, "plugin%d" % plugin)
+        os.makedirs(plugin_dir)
+        with open(os.path.join(plugin_dir, "plugin%d.ini" % plugin), "w") as ini:
+            ini.write("[v1]\nhandlers=Handler%d\n" % plugin)
+        for module in range(modules):
+            with open(os.path.join(plugin_dir, "module%d_%d.py" % (plugin, module)), "w") as source:
+                source.write("from yarf.restresource import RestResource\n\n")
+                for constant in range(constants):
+                    source.write("VALUE_%d_%d_%d = %d\n" % (plugin, module, constant, constant))
+                if module == 0:
+                    source.write(HANDLER_SOURCE % plugin)
+    with open(os.path.join(directory, "benchauth.py"), "w") as source:
+        source.write(AUTH_SOURCE)
+    with open(os.path.join(directory, "config.ini"), "w") as config:
+        config.write("[restframe]\nauth_method=benchauth.BenchAuth\nhandler_directory=%s\n"
+                     "plugin_cache_file=%s\n" % (handlers, os.path.join(directory, "manifests.json")))
+    compileall.compile_dir(directory, quiet=True)
+
+
+def discover(directory, mode):
+    """ Runs in the child process, returns the seconds taken and the amount
+        of handlers found
+    """
+    sys.path.insert(0, SRC)
+    sys.path.insert(0, directory)
+    from flask import Flask
+    from flask_restful import Api
+    from yarf.restfulargs import RestConfig
+    from yarf.handlers.pluginhandler import PluginLoader
+    RestConfig().parse(["--config", os.path.join(directory, "config.ini")])
+    if mode != "manifest-cached" and os.path.exists(os.path.join(directory, "manifests.json")):
+        os.unlink(os.path.join(directory, "manifests.json"))
+    loader = PluginLoader(os.path.join(directory, "handlers"), Api(Flask(__name__)), "benchauth.BenchAuth")
+    start = time.time()
+    if mode == "import-all":
+        handlers = []
+        for module_dir in loader.get_module_dirs():
+            for versions in loader.get_modules_from_dir(module_dir).values():
+                for wanted in versions.values():
+                    handlers.extend(loader.get_classes_from_dir(module_dir, wanted))
+    else:
+        handlers = loader.get_modules()
+    return time.time() - start, len(handlers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plugin discovery")
+    parser.add_argument("--plugins", type=int, default=300)
+    parser.add_argument("--modules", type=int, default=5)
+    parser.add_argument("--constants", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--directory", help="Existing tree to use instead of a new temporary one")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.child:
+        elapsed, handlers = discover(options.directory, options.child)
+        print "%f %d" % (elapsed, handlers)
+        return
+
+    directory = options.directory
+    created = directory is None
+    if created:
+        directory = tempfile.mkdtemp(prefix="yarf-plugins-")
+        create_tree(directory, options.plugins, options.modules, options.constants)
+    try:
+        print "%d plugins with %d modules of %d names" % (options.plugins, options.modules, options.constants)
+        for mode in MODES:
+            times = []
+            for _ in range(options.runs):
+                output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child", mode,
+                                                  "--directory", directory])
+                elapsed, handlers = output.split()[-2:]
+                times.append(float(elapsed))
+            print "  %-16s %s s (%s handlers)" % (mode, ", ".join("%.2f" % t for t in times), handlers)
+    finally:
+        if created:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Times the serialization of large responses with the flask-restful JSON
+representation and with the yarf.serializers representations.
+
+The payload is a list of host records with nested alarms, grown to the
+requested sizes. flask-restful is timed in debug mode, where it indents
+and sorts the keys, and without debug. The optional backends (simplejson,
+ujson, msgpack) are skipped when they are not installed.
+
+    python tools/bench_serializers.py [--sizes 1,10] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from flask import Flask # pylint: disable=wrong-import-position
+from flask_restful.representations.json import output_json as restful_output_json # pylint: disable=wrong-import-position
+import yarf.serializers as serializers # pylint: disable=wrong-import-position
+
+app = Flask(__name__)
+
+
+def get_record(index):
+    return {"id": index, "name": u"host-%d" % index, "ip": "192.168.%d.%d" % (index % 255, index % 7),
+            "alarms": [{"severity": "major", "text": "disk %d full" % alarm, "value": alarm * 1.5}
+                       for alarm in range(3)],
+            "enabled": index % 2 == 0}
+
+
+def get_payload(megabytes):
+    record_size = len(json.dumps(get_record(0))) + 1
+    records = int(megabytes * 1000000 / record_size)
+    return {"code": 0, "description": "", "data": [get_record(index) for index in range(records)]}
+
+
+def best_time(func, data, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        func(data)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def with_backend(backend):
+    serializer = serializers.JSONSerializer(backend)
+    def output(data):
+        serializers.json_serializer = serializer
+        return serializers.output_json(data, 200)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the response serialization")
+    parser.add_argument("--sizes", default="1,10", help="Payload sizes in MB, comma separated")
+    parser.add_argument("--repeat", type=int, default=5)
+    options = parser.parse_args()
+
+    outputs = [("flask-restful debug", True, lambda data: restful_output_json(data, 200)),
+               ("flask-restful", False, lambda data: restful_output_json(data, 200)),
+               ("json", False, with_backend("json"))]
+    if serializers.simplejson is not None:
+        outputs.append(("simplejson", False, with_backend("simplejson")))
+    if serializers.ujson is not None:
+        outputs.append(("ujson", False, with_backend("ujson")))
+    if serializers.msgpack is not None:
+        outputs.append(("msgpack", False, lambda data: serializers.output_msgpack(data, 200)))
+
+    for size in options.sizes.split(","):
+        data = get_payload(float(size))
+        raw = serializers.RawJSON(json.dumps(data))
+        print "%.1f MB, %d records, best of %d:" % (len(raw.data) / 1e6, len(data["data"]), options.repeat)
+        with app.test_request_context("/"):
+            for name, debug, output in outputs:
+                app.debug = debug
+                print "  %-20s %8.1f ms" % (name, best_time(output, data, options.repeat))
+            app.debug = False
+            serializers.json_serializer = serializers.JSONSerializer()
+            print "  %-20s %8.2f ms" % ("RawJSON", best_time(lambda data: serializers.output_json(data, 200),
+                                                              raw, options.repeat))
+
+
+if __name__ == "__main__":
+    main()
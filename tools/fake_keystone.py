@@ -0,0 +1,136 @@
+# Copyright 2019 Nokia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+A local fake Keystone v3 for the authentication benchmarks.
+
+Answers the password authentication (POST /v3/auth/tokens), the version
+discovery and the token validation (GET /v3/auth/tokens) with a token that
+has the admin role and an identity endpoint pointing back to the server.
+GET /connections returns the amount of TCP connections accepted so far.
+
+    --delay       seconds to wait before every response
+    --connect-delay
+                  seconds to wait after accepting a connection, stands in
+                  for the TLS handshake
+    --hang        accept the connections but never answer, Keystone down
+
+    python tools/fake_keystone.py [--port 35357] [--delay 0.005]
+"""
+
+import argparse
+import json
+import threading
+import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+
+class FakeKeystoneHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # One write per response, the unbuffered headers would wait for the
+    # delayed ACKs of the client
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.count_connection()
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+
+    def log_message(self, *args): # pylint: disable=arguments-differ
+        pass
+
+    def reply(self, code, body, headers=()):
+        if self.server.hang:
+            time.sleep(3600)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        data = json.dumps(body)
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self): # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.reply(201, self.server.get_token(), [("X-Subject-Token", "service-token")])
+
+    def do_GET(self): # pylint: disable=invalid-name
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/connections":
+            self.reply(200, {"connections": self.server.connections})
+        elif path == "/v3":
+            self.reply(200, {"version": self.server.get_version()})
+        elif path == "/v3/auth/tokens":
+            self.reply(200, self.server.get_token())
+        else:
+            self.reply(300, {"versions": {"values": [self.server.get_version()]}})
+
+
+class FakeKeystone(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, delay=0.0, connect_delay=0.0, hang=False):
+        HTTPServer.__init__(self, address, FakeKeystoneHandler)
+        self.delay = delay
+        self.connect_delay = connect_delay
+        self.hang = hang
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.url = "http://%s:%d" % self.server_address
+
+    def count_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def get_version(self):
+        return {"id": "v3.10", "status": "stable", "updated": "2018-01-01T00:00:00Z",
+                "links": [{"rel": "self", "href": self.url + "/v3/"}],
+                "media-types": [{"base": "application/json",
+                                 "type": "application/vnd.openstack.identity-v3+json"}]}
+
+    def get_token(self):
+        endpoints = [{"id": interface, "interface": interface, "region": "RegionOne", "region_id": "RegionOne",
+                      "url": self.url + "/v3"} for interface in ("admin", "internal", "public")]
+        domain = {"id": "default", "name": "Default"}
+        return {"token": {"methods": ["password"],
+                          "expires_at": "2099-01-01T00:00:00.000000Z",
+                          "issued_at": "2019-01-01T00:00:00.000000Z",
+                          "user": {"id": "admin", "name": "admin", "domain": domain},
+                          "project": {"id": "admin", "name": "admin", "domain": domain},
+                          "roles": [{"id": "admin", "name": "admin"}],
+                          "catalog": [{"type": "identity", "id": "keystone", "name": "keystone",
+                                       "endpoints": endpoints}]}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Keystone v3 server")
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=35357)
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    parser.add_argument("--hang", action="store_true")
+    options = parser.parse_args()
+    FakeKeystone((options.address, options.port), options.delay, options.connect_delay,
+                 options.hang).serve_forever()
+
+
+if __name__ == "__main__":
+    main()